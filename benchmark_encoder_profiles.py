@@ -0,0 +1,74 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+Benchmark the encoder profiles of the image converter over a reference corpus. Every
+image in the corpus is converted with each profile into a temporary folder (the corpus
+itself is never modified), and the throughput and the bytes saved against the source
+files are reported per profile, so the cost of each profile can be checked on real images.
+
+Usage: python benchmark_encoder_profiles.py <corpus-folder> [workers] [target-format]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import concurrent.futures
+from utils import encode_image, get_save_format, get_target_extension, is_supported_image_file, ENCODER_PROFILES
+
+
+def encode_job(job, save_format, profile):
+    """Encode one (source, output) pair and return (bytes read, bytes written)."""
+    source, output = job
+    encode_image(source, output, save_format, profile=profile)
+    return os.path.getsize(source), os.path.getsize(output)
+
+
+def run_profile(profile, files, workers, target_format, output_dir):
+    """Convert files with one profile and return (seconds, bytes read, bytes written)."""
+    save_format = get_save_format(target_format)
+    target_ext = get_target_extension(target_format)
+    jobs = [(source, os.path.join(output_dir, f"{i}{target_ext}")) for i, source in enumerate(files)]
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(encode_job, jobs, [save_format] * len(jobs), [profile] * len(jobs)))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(read for read, _ in sizes), sum(written for _, written in sizes)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_encoder_profiles.py <corpus-folder> [workers] [target-format]")
+        sys.exit(1)
+
+    corpus = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    target_format = sys.argv[3] if len(sys.argv) > 3 else 'JPG'
+
+    files = []
+    for root, _, names in os.walk(corpus):
+        files.extend(os.path.join(root, name) for name in names if is_supported_image_file(name))
+    if not files:
+        print("No supported images found in", corpus)
+        sys.exit(1)
+
+    print(f"Corpus: {corpus} | files: {len(files)} | workers: {workers} | target: {target_format}")
+    print(f"{'profile':<10}{'seconds':>9}{'img/s':>9}{'MB/s':>8}{'output MB':>11}{'saved MB':>10}{'saved':>8}")
+    for profile in ENCODER_PROFILES:
+        output_dir = tempfile.mkdtemp(prefix=f"bench_{profile}_")
+        try:
+            seconds, bytes_read, bytes_written = run_profile(profile, files, workers, target_format, output_dir)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        saved = bytes_read - bytes_written
+        print(
+            f"{profile:<10}{seconds:>9.2f}{len(files) / seconds:>9.1f}{bytes_read / seconds / 1e6:>8.1f}"
+            f"{bytes_written / 1e6:>11.2f}{saved / 1e6:>10.2f}{saved / bytes_read * 100:>7.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
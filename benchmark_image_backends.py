@@ -0,0 +1,89 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+Benchmark the thread and process backends of the image converter over a reference corpus.
+Each format found in the corpus is converted with both backends into a temporary folder
+(the corpus itself is never modified), and the throughput of each is reported so the
+auto backend thresholds in image_pipeline.py can be checked against real hardware.
+
+Usage: python benchmark_image_backends.py <corpus-folder> [workers] [target-format]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import concurrent.futures
+from collections import defaultdict
+from utils import encode_image, get_save_format, get_target_extension, init_image_process, is_supported_image_file
+from image_pipeline import PROCESS_CHUNK_SIZE
+
+
+def encode_chunk(jobs, save_format):
+    """Encode a chunk of (source, output) pairs and return the number of bytes read."""
+    bytes_read = 0
+    for source, output in jobs:
+        encode_image(source, output, save_format)
+        bytes_read += os.path.getsize(source)
+    return bytes_read
+
+
+def run_backend(backend, files, workers, target_format, output_dir):
+    """Convert files with one backend and return (seconds, bytes read)."""
+    save_format = get_save_format(target_format)
+    target_ext = get_target_extension(target_format)
+    jobs = [(source, os.path.join(output_dir, f"{i}{target_ext}")) for i, source in enumerate(files)]
+    start = time.perf_counter()
+    if backend == 'process':
+        chunk_size = max(1, min(PROCESS_CHUNK_SIZE, len(jobs) // (workers * 4)))
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_image_process) as executor:
+            bytes_read = sum(executor.map(encode_chunk, chunks, [save_format] * len(chunks)))
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            bytes_read = sum(executor.map(encode_chunk, [[job] for job in jobs], [save_format] * len(jobs)))
+    return time.perf_counter() - start, bytes_read
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_image_backends.py <corpus-folder> [workers] [target-format]")
+        sys.exit(1)
+
+    corpus = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    target_format = sys.argv[3] if len(sys.argv) > 3 else 'JPG'
+
+    by_extension = defaultdict(list)
+    for root, _, files in os.walk(corpus):
+        for file in files:
+            if is_supported_image_file(file):
+                by_extension[os.path.splitext(file)[1].lower()].append(os.path.join(root, file))
+    if not by_extension:
+        print("No supported images found in", corpus)
+        sys.exit(1)
+
+    print(f"Corpus: {corpus} | workers: {workers} | target: {target_format}")
+    print(f"{'format':<8}{'files':>7}{'thread img/s':>14}{'process img/s':>15}{'thread MB/s':>13}{'process MB/s':>14}  faster")
+    for extension, files in sorted(by_extension.items()):
+        results = {}
+        for backend in ('thread', 'process'):
+            output_dir = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+            try:
+                results[backend] = run_backend(backend, files, workers, target_format, output_dir)
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+        thread_s, thread_bytes = results['thread']
+        process_s, process_bytes = results['process']
+        print(
+            f"{extension:<8}{len(files):>7}{len(files) / thread_s:>14.1f}{len(files) / process_s:>15.1f}"
+            f"{thread_bytes / thread_s / 1e6:>13.1f}{process_bytes / process_s / 1e6:>14.1f}  "
+            f"{'thread' if thread_s <= process_s else 'process'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+Benchmark the cold start of the GUI. Each run starts a fresh interpreter that imports
+main.py and shows the main window, and reports how long the imports and the first shown
+window took. The benchmark fails if the median time to the first window is over the
+budget, or if a module that should only load when a tab starts work was imported at
+startup, so slow imports cannot creep back into the startup path unnoticed.
+
+Usage: python benchmark_startup.py [budget-ms] [runs]
+Set QT_QPA_PLATFORM=offscreen on machines without a display.
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+# Milliseconds allowed from the first import to the first shown window (median of the runs)
+DEFAULT_BUDGET_MS = 1000
+
+DEFAULT_RUNS = 5
+
+# Modules that must not be imported before a tab starts work
+DEFERRED_MODULES = ('PIL', 'pillow_heif', 'sqlite3', 'image_pipeline', 'video_pipeline',
+                    'photo_converting', 'video_converting')
+
+# Run in each fresh interpreter; prints one JSON line with the timings and the deferred modules loaded
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from PySide6.QtWidgets import QApplication
+app = QApplication(sys.argv)
+window = main.MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'window_ms': (shown - start) * 1000,
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def run_once():
+    """Start a fresh interpreter and return its timings, including interpreter startup."""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        print(completed.stderr)
+        sys.exit(1)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['total_ms'] = elapsed_ms
+    return result
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RUNS
+
+    results = []
+    print(f"{'run':<5}{'imports ms':>12}{'window ms':>11}{'process ms':>12}")
+    for index in range(runs):
+        result = run_once()
+        results.append(result)
+        print(f"{index + 1:<5}{result['import_ms']:>12.1f}{result['window_ms']:>11.1f}{result['total_ms']:>12.1f}")
+
+    window_ms = statistics.median(result['window_ms'] for result in results)
+    loaded = sorted({name for result in results for name in result['loaded']})
+    print(f"Median time to first window: {window_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+
+    failed = False
+    if window_ms > budget_ms:
+        print("FAIL: startup is over budget.")
+        failed = True
+    if loaded:
+        print(f"FAIL: imported at startup but should be deferred: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module is the command line entry point for batch runs on machines without a display.
+It drives the same pipelines as the GUI and never imports PySide6.
+
+Usage:
+    python -m cli scan <folder> [--list videos|images|leftovers]
+    python -m cli convert-video <folder> [--codec h265|h264] [--gpu [--amd]] [--handbrake] [--watch]
+    python -m cli convert-images <folder> [--format JPG|PNG] [--backend auto|thread|process] [--watch]
+    python -m cli strip-metadata <folder> [--mode per_file|batch|builtin] [--watch]
+
+Messages go to stdout, progress and (with --verbose) status lines to stderr. Ctrl+C stops
+the run the same way Stop All does. The exit code is 1 if any file failed, 130 if stopped.
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import threading
+import multiprocessing
+from scanner import scan_directory, DEFAULT_SCAN_WORKERS
+from utils import sanitize_path, ENCODER_PROFILES, DEFAULT_ENCODER_PROFILE
+
+# Seconds between checks for Ctrl+C while a pipeline runs
+JOIN_INTERVAL = 0.5
+
+
+class ConsoleReporter:
+    """
+    Prints pipeline events. Connected to the events of a pipeline in place of the widgets.
+    """
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.last_percent = None
+        self.failed = False
+
+    def status(self, message):
+        with self.lock:
+            print(message, flush=True)
+
+    def status_bar(self, message):
+        if self.verbose:
+            with self.lock:
+                print(message, file=sys.stderr, flush=True)
+
+    def file_failed(self, file_path):
+        self.failed = True
+
+    def progress(self, percent):
+        # Only changes are printed, so a long run writes at most a hundred lines
+        if percent != self.last_percent:
+            self.last_percent = percent
+            with self.lock:
+                print(f"[{percent:3d}%]", file=sys.stderr, flush=True)
+
+    def connect(self, pipeline, *verbose_events):
+        pipeline.update_status.connect(self.status)
+        pipeline.update_status_bar.connect(self.status_bar)
+        pipeline.update_progress.connect(self.progress)
+        pipeline.update_failed.connect(self.file_failed)
+        for event in verbose_events:
+            event.connect(self.status_bar)
+
+
+def tool_path(bundled_path, name, override=None):
+    """
+    Return the path of an external tool: the path given on the command line, else the copy
+    bundled in the resources folder, else the one on the PATH.
+    """
+    if override:
+        return sanitize_path(override)
+    if os.path.isfile(bundled_path):
+        return bundled_path
+    return shutil.which(name) or bundled_path
+
+
+def run_pipeline(pipeline, reporter):
+    """
+    Run a pipeline on a worker thread, stopping it on Ctrl+C, and return the exit code.
+    """
+    thread = threading.Thread(target=pipeline.run)
+    thread.start()
+    stopped = False
+    while thread.is_alive():
+        try:
+            thread.join(JOIN_INTERVAL)
+        except KeyboardInterrupt:
+            if not stopped:
+                stopped = True
+                print("Stopping...", file=sys.stderr, flush=True)
+                pipeline.stop()
+    if stopped:
+        return 130
+    return 1 if reporter.failed else 0
+
+
+def run_scan(args):
+    result = scan_directory(args.directory, workers=args.workers)
+    leftovers = result.video_temp_files + result.image_temp_files
+    listed = {'videos': result.videos, 'images': result.images, 'leftovers': leftovers}
+    if args.list:
+        for file_path in sorted(listed[args.list]):
+            print(file_path)
+    else:
+        print(f"Videos: {len(result.videos)}")
+        print(f"Images: {len(result.images)}")
+        print(f"Leftovers of interrupted runs: {len(leftovers)}")
+    for folder, error in result.errors:
+        print(f"Could not read folder {folder}: {error}", file=sys.stderr)
+    return 1 if result.errors else 0
+
+
+def run_convert_video(args):
+    from video_pipeline import VideoPipeline
+
+    pipeline = VideoPipeline(args.directory, args.gpu, args.handbrake, args.amd, args.codec,
+                             use_probe_cache=not args.no_cache, revalidate_cache=args.revalidate_cache,
+                             cpu_jobs=args.cpu_jobs, hardware_jobs=args.hardware_jobs, remux_jobs=args.remux_jobs,
+                             triage_first=not args.no_triage, watch=args.watch,
+                             min_savings_percent=args.min_savings)
+    pipeline.ffmpeg_path = tool_path(pipeline.ffmpeg_path, 'ffmpeg', args.ffmpeg)
+    pipeline.ffprobe_path = tool_path(pipeline.ffprobe_path, 'ffprobe', args.ffprobe)
+    pipeline.handbrake_cli_path = tool_path(pipeline.handbrake_cli_path, 'HandBrakeCLI', args.handbrake_cli)
+    reporter = ConsoleReporter(args.verbose)
+    reporter.connect(pipeline, pipeline.update_ffmpeg_output)
+    return run_pipeline(pipeline, reporter)
+
+
+def run_convert_images(args):
+    from image_pipeline import ImagePipeline
+
+    pipeline = ImagePipeline(args.directory, args.max_cores, 'convert', args.format, args.backend,
+                             use_manifest=not args.no_manifest, watch=args.watch, max_dimension=args.max_dimension,
+                             memory_budget=int(args.memory_budget * 1024 ** 2) if args.memory_budget else None,
+                             profile=args.profile, min_savings_percent=args.min_savings)
+    reporter = ConsoleReporter(args.verbose)
+    reporter.connect(pipeline)
+    return run_pipeline(pipeline, reporter)
+
+
+def run_strip_metadata(args):
+    from image_pipeline import ImagePipeline
+
+    pipeline = ImagePipeline(args.directory, args.max_cores, 'remove_metadata', metadata_mode=args.mode,
+                             watch=args.watch)
+    reporter = ConsoleReporter(args.verbose)
+    reporter.connect(pipeline)
+    return run_pipeline(pipeline, reporter)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Frostbyte Media Tools without the GUI.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, handler, help_text):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument('directory', help="Folder to process, including every folder below it.")
+        command.set_defaults(handler=handler)
+        return command
+
+    def add_run_options(command):
+        command.add_argument('--watch', action='store_true',
+                             help="Keep running after the first pass and process new files until Ctrl+C.")
+        command.add_argument('-v', '--verbose', action='store_true', help="Also print status lines.")
+
+    scan = add_command('scan', run_scan, "Count the videos, images and leftovers in a folder.")
+    scan.add_argument('--list', choices=('videos', 'images', 'leftovers'), help="Print the paths instead of the counts.")
+    scan.add_argument('--workers', type=int, default=DEFAULT_SCAN_WORKERS, help="Folders listed at once.")
+
+    video = add_command('convert-video', run_convert_video, "Convert videos to H.265 or H.264.")
+    video.add_argument('--codec', choices=('h265', 'h264'), default='h265')
+    video.add_argument('--gpu', action='store_true', help="Encode on the GPU (NVIDIA unless --amd).")
+    video.add_argument('--amd', action='store_true', help="Use AMD instead of NVIDIA encoding; requires --gpu.")
+    video.add_argument('--handbrake', action='store_true', help="Encode with HandBrakeCLI instead of ffmpeg.")
+    video.add_argument('--cpu-jobs', type=int, default=1, help="Concurrent CPU encodes.")
+    video.add_argument('--hardware-jobs', type=int, default=1, help="Concurrent GPU encodes.")
+    video.add_argument('--remux-jobs', type=int, default=2, help="Concurrent remuxes.")
+    video.add_argument('--no-triage', action='store_true', help="Process each video as soon as it is checked.")
+    video.add_argument('--no-cache', action='store_true', help="Do not use the probe cache.")
+    video.add_argument('--revalidate-cache', action='store_true', help="Probe every video again.")
+    video.add_argument('--ffmpeg', help="Path to ffmpeg (default: bundled, else PATH).")
+    video.add_argument('--ffprobe', help="Path to ffprobe (default: bundled, else PATH).")
+    video.add_argument('--handbrake-cli', help="Path to HandBrakeCLI (default: bundled, else PATH).")
+    video.add_argument('--min-savings', type=float, metavar='PERCENT',
+                       help="Keep the original unless the encode is at least this much smaller.")
+    add_run_options(video)
+
+    images = add_command('convert-images', run_convert_images, "Convert images to JPG, PNG, WebP, AVIF or HEIF.")
+    images.add_argument('--format', choices=('JPG', 'PNG', 'WebP', 'AVIF', 'HEIF'), default='JPG')
+    images.add_argument('--backend', choices=('auto', 'thread', 'process'), default='auto')
+    images.add_argument('--profile', choices=tuple(ENCODER_PROFILES), default=DEFAULT_ENCODER_PROFILE,
+                        help="Encoder speed against output size.")
+    images.add_argument('--max-cores', action='store_true', help="Use every CPU core instead of two workers.")
+    images.add_argument('--max-dimension', type=int, metavar='PIXELS',
+                        help="Scale images down so their longer side is at most this many pixels.")
+    images.add_argument('--memory-budget', type=float, metavar='MB',
+                        help="Memory the images converted at once may take when decoded (default: half of the RAM).")
+    images.add_argument('--no-manifest', action='store_true', help="Check every file, even those converted before.")
+    images.add_argument('--min-savings', type=float, metavar='PERCENT',
+                        help="Keep the original unless the converted file is at least this much smaller.")
+    add_run_options(images)
+
+    metadata = add_command('strip-metadata', run_strip_metadata, "Remove comment and keyword metadata from JPG files.")
+    metadata.add_argument('--mode', choices=('per_file', 'batch', 'builtin'), default='per_file')
+    metadata.add_argument('--max-cores', action='store_true', help="Use every CPU core instead of two workers.")
+    add_run_options(metadata)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.directory = sanitize_path(args.directory)
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 2
+    if getattr(args, 'amd', False) and not args.gpu:
+        print("AMD encoding requires GPU encoding to be enabled.", file=sys.stderr)
+        return 2
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Required for the image process pool in the PyInstaller build
+    sys.exit(main())
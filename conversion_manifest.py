@@ -0,0 +1,179 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module records finished image conversions in an SQLite file, so an interrupted run
+can be restarted without handing files it already finished back to the converter.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from utils import get_app_data_dir
+
+# Number of writes collected before they are committed to disk
+COMMIT_INTERVAL = 500
+
+# Maximum number of 'kept' rows before the least recently used are evicted
+DEFAULT_MAX_KEPT = 200000
+
+# Bytes read from the start and the end of a file for its sample hash
+SAMPLE_BYTES = 64 * 1024
+
+# Statuses that mean the file needs no further work for the recorded target format.
+# 'kept' is an original kept because its conversion did not save enough space; it only
+# counts as done while the size guard is on and the conversion would still save too little
+DONE_STATUSES = ('converted', 'skipped', 'kept')
+
+
+def default_manifest_path():
+    """
+    Return the path of the conversion manifest in the user's cache directory.
+    """
+    return os.path.join(get_app_data_dir(), "conversion_manifest.db")
+
+
+def sample_hash(file_path, size):
+    """
+    Hash the size and the first and last SAMPLE_BYTES of a file. Cheap enough to compute for
+    every converted image, and enough to recognise a file whose modification time changed
+    (copied or restored trees) while its content did not.
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_path, 'rb') as file:
+        digest.update(file.read(SAMPLE_BYTES))
+        if size > SAMPLE_BYTES:
+            file.seek(max(SAMPLE_BYTES, size - SAMPLE_BYTES))
+            digest.update(file.read(SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+class ConversionManifest:
+    """
+    One row per source image: its output path, the output's size, mtime_ns and sample
+    hash, the status of the conversion and the target format. Lookups go by output path,
+    because that is the file still on disk after the source has gone to the recycle bin.
+    """
+
+    def __init__(self, db_path=None, max_kept=DEFAULT_MAX_KEPT):
+        self.db_path = db_path or default_manifest_path()
+        self.max_kept = max_kept  # Cap on the number of kept originals remembered
+        self.lock = threading.Lock()
+        self.pending_writes = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversions ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sample_hash TEXT, "
+            "output_path TEXT, status TEXT NOT NULL, target_format TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS conversions_output_path ON conversions (output_path)")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(conversions)")]
+        if 'saved_percent' not in columns:
+            # Manifests written before the size guard existed
+            self.connection.execute("ALTER TABLE conversions ADD COLUMN saved_percent REAL")
+        self.connection.commit()
+
+    def done_status(self, file_path, target_format, min_savings_percent=None):
+        """
+        Return the status ('converted', 'skipped' or 'kept') if file_path is the recorded
+        output of a finished conversion to target_format and has not changed since, else
+        None. A file whose size matches but whose modification time does not is compared by
+        sample hash. A kept original only counts while min_savings_percent is set and its
+        recorded savings are still below it; otherwise it is converted again.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT path, size, mtime_ns, sample_hash, status, saved_percent FROM conversions "
+                "WHERE output_path = ? AND target_format = ? AND status IN (?, ?, ?)",
+                (file_path, target_format) + DONE_STATUSES
+            ).fetchone()
+        if row is None:
+            return None
+        path, size, mtime_ns, recorded_hash, status, saved_percent = row
+        if status == 'kept' and (min_savings_percent is None or saved_percent is None
+                                 or saved_percent >= min_savings_percent):
+            return None
+        try:
+            stat_result = os.stat(file_path)
+            if stat_result.st_size != size:
+                return None
+            if stat_result.st_mtime_ns == mtime_ns:
+                self._touch_kept(path, status)
+                return status
+            if recorded_hash != sample_hash(file_path, stat_result.st_size):
+                return None
+        except OSError:
+            return None
+        with self.lock:
+            self.connection.execute("UPDATE conversions SET mtime_ns = ? WHERE path = ?", (stat_result.st_mtime_ns, path))
+            self._count_write()
+        self._touch_kept(path, status)
+        return status
+
+    def record(self, file_path, output_path, status, target_format, saved_percent=None):
+        """
+        Record the outcome for a source file. For 'converted', 'skipped' and 'kept' the output is
+        stat'ed and hashed so later runs can trust it; errors are kept for reference only.
+        saved_percent is what the discarded conversion of a 'kept' original would have saved.
+        """
+        size = mtime_ns = digest = None
+        if output_path is not None and status in DONE_STATUSES:
+            try:
+                stat_result = os.stat(output_path)
+                size, mtime_ns = stat_result.st_size, stat_result.st_mtime_ns
+                digest = sample_hash(output_path, size)
+            except OSError:
+                status = 'error'
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO conversions "
+                "(path, size, mtime_ns, sample_hash, output_path, status, target_format, saved_percent, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_path, size, mtime_ns, digest, output_path, status, target_format, saved_percent, time.time())
+            )
+            self._count_write()
+
+    def evict(self):
+        """
+        Drop the least recently used 'kept' rows until there are at most max_kept. Converted and
+        skipped rows stay, because their sources are gone and the rows are all that marks them done.
+        """
+        with self.lock:
+            count = self.connection.execute("SELECT COUNT(*) FROM conversions WHERE status = 'kept'").fetchone()[0]
+            excess = count - self.max_kept
+            if excess > 0:
+                self.connection.execute(
+                    "DELETE FROM conversions WHERE path IN "
+                    "(SELECT path FROM conversions WHERE status = 'kept' ORDER BY updated ASC LIMIT ?)",
+                    (excess,)
+                )
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def close(self):
+        """
+        Apply the cap on kept rows, commit outstanding writes, and close the database.
+        """
+        self.evict()
+        with self.lock:
+            self.connection.close()
+
+    def _touch_kept(self, path, status):
+        # A kept row that still skips its original counts as used, so eviction takes the stale ones first
+        if status != 'kept':
+            return
+        with self.lock:
+            self.connection.execute("UPDATE conversions SET updated = ? WHERE path = ?", (time.time(), path))
+            self._count_write()
+
+    def _count_write(self):
+        # Commit in batches; the caller holds the lock
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.pending_writes = 0
@@ -0,0 +1,197 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module parses the machine-readable progress output of ffmpeg (-progress) and
+HandBrakeCLI (--json) into EncodeProgress records, and tracks the whole-batch ETA.
+"""
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class EncodeProgress:
+    """A progress update for one running job."""
+    file_path: str
+    percent: float = None  # Percent of the file done, None if the duration is unknown
+    frame: int = None
+    fps: float = None
+    out_time: float = None  # Seconds of media written so far
+    speed: float = None  # Media seconds encoded per wall-clock second
+    bitrate: str = None
+    eta_seconds: float = None  # Time left for this file
+    batch_eta_seconds: float = None  # Time left for every queued job
+    batch_percent: float = None  # Percent of the whole batch done, counting partial files
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_seconds(seconds):
+    """Format a duration in seconds as H:MM:SS, or '--:--:--' when unknown."""
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(max(0, seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class FfmpegProgressParser:
+    """
+    Parser for the key=value blocks ffmpeg writes with -progress. Each block ends with a
+    progress=continue or progress=end line, at which point feed() returns an EncodeProgress.
+    """
+
+    def __init__(self, file_path, duration=None):
+        self.file_path = file_path
+        self.duration = duration  # Source duration in seconds from the probe
+        self.values = {}
+
+    def feed(self, line):
+        """
+        Feed one output line. Returns an EncodeProgress at the end of a block, None for other
+        progress keys, and False for lines that are not progress output at all.
+        """
+        key, sep, value = line.strip().partition('=')
+        if not sep or not key or ' ' in key:
+            return False
+        self.values[key] = value.strip()
+        if key != 'progress':
+            return None
+
+        values, self.values = self.values, {}
+        out_time = None
+        if _to_int(values.get('out_time_us')) is not None:
+            out_time = _to_int(values['out_time_us']) / 1000000
+        elif _to_int(values.get('out_time_ms')) is not None:
+            out_time = _to_int(values['out_time_ms']) / 1000000  # ffmpeg reports microseconds under this key too
+        speed = _to_float((values.get('speed') or '').rstrip('x'))
+
+        progress = EncodeProgress(
+            file_path=self.file_path,
+            frame=_to_int(values.get('frame')),
+            fps=_to_float(values.get('fps')),
+            out_time=out_time,
+            speed=speed,
+            bitrate=values.get('bitrate'),
+        )
+        if value.strip() == 'end' and self.duration:
+            progress.out_time = self.duration
+        if self.duration and progress.out_time is not None:
+            progress.percent = min(100.0, max(0.0, progress.out_time / self.duration * 100))
+            if speed:
+                progress.eta_seconds = max(0.0, (self.duration - progress.out_time) / speed)
+        return progress
+
+
+class HandBrakeProgressParser:
+    """
+    Parser for the JSON blocks HandBrakeCLI writes with --json. A block starts with a
+    'Progress: {' line and ends when its braces balance.
+    """
+
+    def __init__(self, file_path, duration=None):
+        self.file_path = file_path
+        self.duration = duration
+        self.buffer = None
+        self.depth = 0
+
+    def feed(self, line):
+        """
+        Feed one output line. Returns an EncodeProgress when a WORKING block is complete,
+        None while inside a block, and False for lines that are not part of a JSON block.
+        """
+        stripped = line.strip()
+        if self.buffer is None:
+            if not stripped.startswith('Progress:') or '{' not in stripped:
+                return False
+            self.buffer = []
+            self.depth = 0
+            stripped = stripped[len('Progress:'):].strip()
+
+        self.buffer.append(stripped)
+        self.depth += stripped.count('{') - stripped.count('}')
+        if self.depth > 0:
+            return None
+
+        text, self.buffer = '\n'.join(self.buffer), None
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if data.get('State') != 'WORKING':
+            return None
+
+        working = data.get('Working') or {}
+        fraction = _to_float(working.get('Progress'))
+        passes = _to_int(working.get('PassCount')) or 1
+        current_pass = _to_int(working.get('Pass')) or 1
+        progress = EncodeProgress(
+            file_path=self.file_path,
+            fps=_to_float(working.get('Rate')),
+            eta_seconds=_to_float(working.get('ETASeconds')),
+        )
+        if fraction is not None:
+            # Progress restarts for every pass, so fold the passes into one percentage
+            overall = ((current_pass - 1) + fraction) / max(1, passes)
+            progress.percent = min(100.0, max(0.0, overall * 100))
+            if self.duration:
+                progress.out_time = overall * self.duration
+        return progress
+
+
+class BatchProgress:
+    """
+    Whole-batch progress across concurrent jobs. Work is measured in media seconds, so the
+    batch ETA is the media time still queued divided by the combined rate of all jobs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued_seconds = 0.0  # Media seconds of every job added so far
+        self.finished_seconds = 0.0  # Media seconds of jobs that have finished
+        self.active = {}  # file_path -> (duration, seconds done)
+        self.start_time = None
+
+    def add(self, duration):
+        """Add a job of the given duration in seconds to the batch."""
+        with self.lock:
+            self.queued_seconds += duration or 0.0
+
+    def update(self, file_path, duration, done_seconds):
+        """Record how far a running job has got."""
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = time.time()
+            self.active[file_path] = (duration or 0.0, min(done_seconds or 0.0, duration or 0.0))
+
+    def finish(self, file_path, duration):
+        """Mark a job as finished, whether it succeeded or not."""
+        with self.lock:
+            self.active.pop(file_path, None)
+            self.finished_seconds += duration or 0.0
+
+    def eta_seconds(self):
+        """Return the estimated time left for the whole batch, or None before any job has reported progress."""
+        with self.lock:
+            if self.start_time is None:
+                return None
+            done = self.finished_seconds + sum(seconds for _, seconds in self.active.values())
+            elapsed = time.time() - self.start_time
+            if done <= 0 or elapsed <= 0:
+                return None
+            return max(0.0, self.queued_seconds - done) / (done / elapsed)
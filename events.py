@@ -0,0 +1,36 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module provides the small callback interface the Qt-free pipelines report through.
+An Event is connected to callbacks and emitted like a Qt signal, so the pipelines read the
+same whether a QThread forwards them to the GUI or the command line prints them.
+"""
+
+import threading
+
+
+class Event:
+    """
+    A list of callbacks, called in order from the emitting thread. Unlike a Qt signal there
+    is no queued delivery; callers that need it (the QThread wrappers) forward to a signal.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    def connect(self, callback):
+        with self.lock:
+            self.callbacks.append(callback)
+
+    def disconnect(self, callback):
+        with self.lock:
+            self.callbacks.remove(callback)
+
+    def emit(self, *args):
+        with self.lock:
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            callback(*args)
@@ -0,0 +1,157 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module keeps exiftool processes running in -stay_open mode so metadata edits do not
+pay exiftool's Perl startup cost for every file. Commands are streamed to each process
+through its argument file on stdin and the output is read back up to the {ready} marker.
+"""
+
+import os
+import queue
+import subprocess
+import threading
+import time
+
+# Seconds a single command may run before its process is killed and restarted
+DEFAULT_TIMEOUT = 60
+
+# Seconds to wait for a process to exit after asking it to stop
+CLOSE_TIMEOUT = 5
+
+
+class ExifToolError(Exception):
+    """Raised when an exiftool process dies or stops answering."""
+
+
+class ExifToolProcess:
+    """
+    One exiftool process in -stay_open mode. Output is read by two reader threads, so a
+    command can be abandoned after a timeout without blocking on a pipe.
+    """
+
+    def __init__(self, exiftool_path, timeout=DEFAULT_TIMEOUT):
+        self.exiftool_path = exiftool_path
+        self.timeout = timeout
+        self.process = None
+        self.stdout_lines = None
+        self.stderr_lines = None
+        self.command_number = 0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.exiftool_path, '-stay_open', 'True', '-@', '-'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        self.stdout_lines = queue.Queue()
+        self.stderr_lines = queue.Queue()
+        for stream, lines in ((self.process.stdout, self.stdout_lines), (self.process.stderr, self.stderr_lines)):
+            threading.Thread(target=self._read_lines, args=(stream, lines), daemon=True).start()
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def execute(self, args, timeout=None):
+        """
+        Run one command and return (stdout, stderr) as text. Raises ExifToolError if the
+        process exits or the command runs longer than timeout (default: the process timeout);
+        the process is killed in either case.
+        """
+        if any('\n' in arg for arg in args):
+            raise ValueError("exiftool arguments cannot contain line breaks")
+        if not self.is_running():
+            self.start()
+
+        self.command_number += 1
+        marker = f"{{ready{self.command_number}}}"
+        # -echo4 writes the marker to stderr after the command, so both streams can be read to a known end
+        lines = ['-charset', 'filename=utf8'] + list(args) + ['-echo4', marker, f'-execute{self.command_number}']
+        try:
+            self.process.stdin.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except OSError as e:
+            self.kill()
+            raise ExifToolError(f"exiftool stopped accepting commands: {e}")
+
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        stdout = self._read_until(self.stdout_lines, marker, deadline, timeout)
+        stderr = self._read_until(self.stderr_lines, marker, deadline, timeout)
+        return stdout, stderr
+
+    def close(self):
+        """Ask the process to exit, killing it if it does not stop in time."""
+        if not self.is_running():
+            return
+        try:
+            self.process.stdin.write(b'-stay_open\nFalse\n')
+            self.process.stdin.flush()
+            self.process.wait(timeout=CLOSE_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def _read_until(self, lines, marker, deadline, timeout):
+        output = []
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = lines.get(timeout=max(0.0, remaining))
+            except queue.Empty:
+                self.kill()
+                raise ExifToolError(f"exiftool did not answer within {timeout} seconds")
+            if line is None:
+                self.kill()
+                raise ExifToolError("exiftool exited unexpectedly")
+            if line.strip() == marker:
+                return ''.join(output)
+            output.append(line)
+
+    @staticmethod
+    def _read_lines(stream, lines):
+        # Runs in a reader thread until the process closes the pipe
+        for line in iter(stream.readline, b''):
+            lines.put(line.decode('utf-8', errors='replace'))
+        lines.put(None)
+
+
+class ExifToolPool:
+    """
+    A fixed number of exiftool processes shared by worker threads. Each call borrows an
+    idle process, so up to size commands run at once. Processes start on first use and a
+    process that crashed or timed out is started again for the next command.
+    """
+
+    def __init__(self, exiftool_path, size=None, timeout=DEFAULT_TIMEOUT):
+        self.size = size or os.cpu_count() or 1
+        self.processes = [ExifToolProcess(exiftool_path, timeout) for _ in range(self.size)]
+        self.idle = queue.Queue()
+        for process in self.processes:
+            self.idle.put(process)
+
+    def execute(self, args, timeout=None):
+        """Run one command on an idle process and return (stdout, stderr)."""
+        process = self.idle.get()
+        try:
+            return process.execute(args, timeout)
+        finally:
+            self.idle.put(process)
+
+    def close(self):
+        for process in self.processes:
+            process.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
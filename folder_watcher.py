@@ -0,0 +1,268 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module watches a media folder for new and changed files after a run, so the workers
+can keep converting what is dropped into the folder without rescanning the whole library.
+On Linux it listens to inotify events; elsewhere it polls the modification time of each
+folder and only lists the folders that changed. Files are handed out once their size and
+modification time have stopped changing, so copies that are still being written are
+never picked up half done.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from scanner import classify_name, scan_folder
+
+# Seconds a file's size and modification time must stay the same before it is handed out
+DEFAULT_SETTLE_SECONDS = 5.0
+
+# Seconds between two checks of the pending files (and of the folders, when polling)
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+EVENT_BUFFER_SIZE = 64 * 1024
+
+
+class InotifyBackend:
+    """
+    Change notifications from the Linux kernel. inotify is not recursive, so every folder
+    gets its own watch; new folders are watched as soon as their creation is reported.
+    """
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.lock = threading.Lock()
+        self.folders = {}  # watch descriptor -> folder
+
+    def add_folder(self, folder):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Could not watch {folder}")
+        with self.lock:
+            self.folders[wd] = folder
+
+    def poll(self, timeout):
+        """
+        Wait up to timeout seconds and return (changed files, new folders, overflowed).
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return [], [], False
+        try:
+            data = os.read(self.fd, EVENT_BUFFER_SIZE)
+        except BlockingIOError:
+            return [], [], False
+
+        files, folders, overflowed = [], [], False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + name_length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+            with self.lock:
+                folder = self.folders.pop(wd, None) if mask & IN_IGNORED else self.folders.get(wd)
+            if folder is None or not name:
+                continue
+            path = os.path.join(folder, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    folders.append(path)
+            else:
+                files.append(path)
+        return files, folders, overflowed
+
+    def known_folders(self):
+        with self.lock:
+            return list(self.folders.values())
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """
+    Portable fallback. Creating, renaming or deleting a file changes its folder's
+    modification time, so each poll stats the folders only and lists just the ones that
+    changed. A folder's names are recorded when it is added, so its first change only
+    reports the files that were not there yet, not everything the first run left alone.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.folders = {}  # folder -> (mtime_ns, set of names at the last listing)
+
+    def add_folder(self, folder):
+        # The mtime is read first, so a file added while listing shows up as a change
+        mtime_ns = os.stat(folder).st_mtime_ns
+        with os.scandir(folder) as entries:
+            names = {entry.name for entry in entries}
+        with self.lock:
+            self.folders[folder] = (mtime_ns, names)
+
+    def poll(self, timeout):
+        time.sleep(timeout)
+        files, new_folders = [], []
+        with self.lock:
+            folders = list(self.folders.items())
+        for folder, (mtime_ns, names) in folders:
+            try:
+                current = os.stat(folder).st_mtime_ns
+            except OSError:
+                with self.lock:
+                    self.folders.pop(folder, None)  # Folder removed
+                continue
+            if current == mtime_ns:
+                continue
+            subfolders, found, _ = scan_folder(folder)
+            listed = {os.path.basename(path) for _, path in found}
+            files.extend(path for _, path in found if os.path.basename(path) not in names)
+            with self.lock:
+                new_folders.extend(path for path in subfolders if path not in self.folders)
+                self.folders[folder] = (current, listed)
+        return files, new_folders, False
+
+    def known_folders(self):
+        with self.lock:
+            return list(self.folders)
+
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    """
+    Collects new and changed files of one kind and hands them out once they are stable.
+    Folders are registered with add_folder, normally by the scan just before it lists
+    them, so nothing that arrives during the first run is missed.
+    """
+
+    def __init__(self, kind, extensions=None, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        self.kind = kind  # 'video' or 'image'
+        self.extensions = extensions  # Only files with these extensions, or every file of the kind
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.pending = {}  # path -> (size, mtime_ns, time the size and mtime last changed)
+        self.handed_out = {}  # path -> (size, mtime_ns) when it was last handed out
+        self.backend = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self.backend = InotifyBackend()
+            except (AttributeError, OSError):
+                self.backend = None  # No inotify in this libc or kernel; poll instead
+        if self.backend is None:
+            self.backend = PollingBackend()
+
+    def add_folder(self, folder):
+        """Start watching a folder. Safe to call from the scan threads."""
+        try:
+            self.backend.add_folder(folder)
+        except OSError:
+            pass  # Folder vanished or the watch limit is reached; its files are still scanned once
+
+    def wait_for_files(self, should_stop):
+        """
+        Block until at least one watched file is stable, or should_stop returns True, and
+        return the stable files.
+        """
+        while not should_stop():
+            files, folders, overflowed = self.backend.poll(self.poll_interval)
+            if overflowed:
+                files = files + self.list_all_folders()  # Events were lost; look at everything once
+            for folder in folders:
+                files.extend(self.add_tree(folder))
+            for path in files:
+                self.note_change(path)
+            ready = self.take_stable_files()
+            if ready:
+                return ready
+        return []
+
+    def add_tree(self, folder):
+        """Watch a new folder and everything below it, returning the files already in it."""
+        files = []
+        pending = [folder]
+        while pending:
+            current = pending.pop()
+            self.add_folder(current)  # Watch before listing, so nothing slips in between
+            subfolders, found, _ = scan_folder(current)
+            pending.extend(subfolders)
+            files.extend(path for _, path in found)
+        return files
+
+    def list_all_folders(self):
+        files = []
+        for folder in self.backend.known_folders():
+            files.extend(path for _, path in scan_folder(folder)[1])
+        return files
+
+    def note_change(self, path):
+        """Start or restart the settle timer of a file that was reported as changed."""
+        if classify_name(os.path.basename(path)) != self.kind:
+            return
+        if self.extensions is not None and not path.lower().endswith(self.extensions):
+            return
+        if path not in self.pending:
+            self.pending[path] = (None, None, time.monotonic())
+
+    def mark_handled(self, path):
+        """
+        Record the current size and mtime of a file the worker has just written itself, so
+        the changes reported for that write do not hand the file out again.
+        """
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return
+        self.handed_out[path] = (stat_result.st_size, stat_result.st_mtime_ns)
+
+    def take_stable_files(self):
+        """Return and forget the pending files whose size and mtime have settled."""
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime_ns, changed_at) in list(self.pending.items()):
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                del self.pending[path]  # Deleted or renamed before it settled
+                continue
+            current = (stat_result.st_size, stat_result.st_mtime_ns)
+            if current != (size, mtime_ns):
+                self.pending[path] = current + (now,)
+                continue
+            if now - changed_at < self.settle_seconds:
+                continue
+            del self.pending[path]
+            if self.handed_out.get(path) == current:
+                continue  # Reported again without changing, e.g. by a folder listing
+            self.handed_out[path] = current
+            ready.append(path)
+        return ready
+
+    def close(self):
+        self.backend.close()
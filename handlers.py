@@ -9,9 +9,16 @@ starting image conversion, starting metadata removal, and starting video process
 
 import os
 from PySide6.QtWidgets import QFileDialog, QMessageBox
-from photo_converting import ImageWorkerThread
-from video_converting import VideoWorkerThread
-from utils import sanitize_path, is_supported_image_file
+from utils import sanitize_path
+
+# Backend selector labels mapped to ImageWorkerThread backend names
+IMAGE_BACKENDS = {"Auto": 'auto', "Threads": 'thread', "Processes": 'process'}
+
+# Profile selector labels mapped to encoder profiles
+ENCODER_PROFILES = {"Fast": 'fast', "Balanced": 'balanced', "Archive": 'archive'}
+
+# Metadata mode selector labels mapped to ImageWorkerThread metadata modes
+METADATA_MODES = {"Per File": 'per_file', "Batched": 'batch', "Built-in": 'builtin'}
 
 def browse_directory(dir_input):
     """
@@ -32,18 +39,24 @@ def start_image_conversion(widget):
         return
 
     target_format = widget.format_selector.currentText() if hasattr(widget, 'format_selector') else 'JPG'
-
-    # Count the total number of image files
-    total_photos = sum([len(files) for r, d, files in os.walk(directory) if any(is_supported_image_file(file) for file in files)])
-    widget.update_photo_counts(total_photos, total_photos)  # Update the photo counts
-
-    # Initialize and start the image worker thread
-    widget.worker_thread = ImageWorkerThread(directory, use_max_cores, 'convert', target_format)
-    widget.worker_thread.update_status.connect(widget.update_status)
-    widget.worker_thread.update_status_bar.connect(widget.update_status_bar)
-    widget.worker_thread.update_progress.connect(widget.update_progress)
-    widget.worker_thread.update_remaining_photos.connect(lambda remaining: widget.update_photo_counts(total_photos, remaining))
-    widget.worker_thread.finished.connect(widget.on_finished)
+    backend = IMAGE_BACKENDS[widget.backend_selector.currentText()]  # Thread or process pool for conversion
+
+    widget.update_photo_counts(0, 0)  # The worker reports the counts once its scan is done
+
+    # Initialize and start the image worker thread. The worker modules load Pillow and libheif,
+    # so they are imported on first use instead of when the window opens
+    from photo_converting import ImageWorkerThread
+    use_manifest = widget.use_manifest_checkbox.isChecked()  # Skip conversions finished by earlier runs
+    watch = widget.watch_checkbox.isChecked()  # Keep converting new files until stopped
+    max_dimension = widget.max_dimension_spinbox.value() or None  # 0 keeps the original size
+    memory_budget = widget.memory_budget_spinbox.value() * 1024 ** 3 or None  # 0 uses half of the RAM
+    profile = ENCODER_PROFILES[widget.profile_selector.currentText()]  # Encoder speed against output size
+    min_savings_percent = widget.min_savings_spinbox.value()  # -1 always replaces the original
+    widget.worker_thread = ImageWorkerThread(directory, use_max_cores, 'convert', target_format, backend,
+                                             use_manifest=use_manifest, watch=watch, max_dimension=max_dimension,
+                                             memory_budget=memory_budget, profile=profile,
+                                             min_savings_percent=min_savings_percent if min_savings_percent >= 0 else None)
+    connect_image_worker(widget)
     widget.worker_thread.start()
     widget.status_bar.showMessage("Starting image conversion...")
 
@@ -57,20 +70,32 @@ def start_metadata_removal(widget):
         QMessageBox.warning(widget, "Invalid Directory", "Please enter a valid directory path.")
         return
 
-    # Count the total number of image files
-    total_photos = sum([len(files) for r, d, files in os.walk(directory) if any(is_supported_image_file(file) for file in files)])
-    widget.update_photo_counts(total_photos, total_photos)  # Update the photo counts
+    metadata_mode = METADATA_MODES[widget.metadata_mode_selector.currentText()]  # Files per exiftool command
+
+    widget.update_photo_counts(0, 0)  # The worker reports the counts once its scan is done
 
     # Initialize and start the image worker thread
-    widget.worker_thread = ImageWorkerThread(directory, use_max_cores, 'remove_metadata')
-    widget.worker_thread.update_status.connect(widget.update_status)
-    widget.worker_thread.update_status_bar.connect(widget.update_status_bar)
-    widget.worker_thread.update_progress.connect(widget.update_progress)
-    widget.worker_thread.update_remaining_photos.connect(lambda remaining: widget.update_photo_counts(total_photos, remaining))
-    widget.worker_thread.finished.connect(widget.on_finished)
+    from photo_converting import ImageWorkerThread
+    watch = widget.watch_checkbox.isChecked()  # Keep cleaning new files until stopped
+    widget.worker_thread = ImageWorkerThread(directory, use_max_cores, 'remove_metadata', metadata_mode=metadata_mode,
+                                             watch=watch)
+    connect_image_worker(widget)
     widget.worker_thread.start()
     widget.status_bar.showMessage("Starting metadata removal...")
 
+def connect_image_worker(widget):
+    """
+    Connect the image worker's signals to the widget through the widget's signal batcher.
+    """
+    worker = widget.worker_thread
+    batcher = widget.signal_batcher
+    batcher.connect_appending(worker.update_status, widget.update_status)
+    batcher.connect_latest(worker.update_status_bar, widget.update_status_bar)
+    batcher.connect_latest(worker.update_progress, widget.update_progress)
+    batcher.connect_latest(worker.update_total_photos, widget.update_total_photos)
+    batcher.connect_latest(worker.update_remaining_photos, widget.update_remaining_photos)
+    batcher.connect_finished(worker.finished, widget.on_finished)
+
 def stop_all_image_operations(widget):
     """
     Stop all ongoing image operations.
@@ -86,6 +111,13 @@ def start_video_processing(widget, codec):
     use_gpu = widget.use_gpu_checkbox.isChecked()  # Check if GPU should be used
     use_handbrake = widget.use_handbrake_checkbox.isChecked()  # Check if HandBrakeCLI should be used
     use_amd = widget.use_amd_checkbox.isChecked()  # Check if AMD should be used
+    revalidate_cache = widget.revalidate_cache_checkbox.isChecked()  # Check if cached probe results should be ignored
+    triage_first = widget.triage_first_checkbox.isChecked()  # Check if all remuxes should finish before encoding
+    cpu_jobs = widget.cpu_jobs_spinbox.value()  # Number of concurrent CPU encodes
+    hardware_jobs = widget.hardware_jobs_spinbox.value()  # Number of concurrent GPU encodes
+    remux_jobs = widget.remux_jobs_spinbox.value()  # Number of concurrent remuxes
+    watch = widget.watch_checkbox.isChecked()  # Keep processing new videos until stopped
+    min_savings_percent = widget.min_savings_spinbox.value()  # -1 always replaces the original
 
     if use_amd and not use_gpu:
         message = "AMD encoding requires GPU encoding to be enabled."
@@ -97,21 +129,33 @@ def start_video_processing(widget, codec):
         QMessageBox.warning(widget, "Invalid Directory", "Please enter a valid directory path.")
         return
 
-    # Count the total number of video files
-    total_videos = sum([len(files) for r, d, files in os.walk(directory) if any(file.lower().endswith(('.mp4', '.mkv', '.avi', '.mov', '.wmv')) for file in files)])
-    widget.update_video_counts(total_videos, total_videos)  # Update the video counts
+    widget.update_video_counts(0, 0)  # The worker reports the counts once its scan is done
 
     # Initialize and start the video worker thread
-    widget.worker_thread = VideoWorkerThread(directory, use_gpu, use_handbrake, use_amd, codec)
-    widget.worker_thread.update_status.connect(widget.update_status)
-    widget.worker_thread.update_status_bar.connect(widget.update_status_bar)
-    widget.worker_thread.update_ffmpeg_output.connect(widget.update_ffmpeg_output)
-    widget.worker_thread.update_progress.connect(widget.update_progress)
-    widget.worker_thread.update_remaining_videos.connect(lambda remaining: widget.update_video_counts(total_videos, remaining))
-    widget.worker_thread.finished.connect(widget.on_finished)
+    from video_converting import VideoWorkerThread
+    widget.worker_thread = VideoWorkerThread(directory, use_gpu, use_handbrake, use_amd, codec, revalidate_cache=revalidate_cache,
+                                             cpu_jobs=cpu_jobs, hardware_jobs=hardware_jobs, remux_jobs=remux_jobs,
+                                             triage_first=triage_first, watch=watch,
+                                             min_savings_percent=min_savings_percent if min_savings_percent >= 0 else None)
+    connect_video_worker(widget)
     widget.worker_thread.start()
     widget.status_bar.showMessage(f"Starting video processing to {codec.upper()}...")
 
+def connect_video_worker(widget):
+    """
+    Connect the video worker's signals to the widget through the widget's signal batcher.
+    """
+    worker = widget.worker_thread
+    batcher = widget.signal_batcher
+    batcher.connect_appending(worker.update_status, widget.update_status)
+    batcher.connect_latest(worker.update_status_bar, widget.update_status_bar)
+    batcher.connect_appending(worker.update_ffmpeg_output, widget.update_ffmpeg_output)
+    batcher.connect_latest(worker.update_encode_progress, widget.update_encode_progress)
+    batcher.connect_latest(worker.update_progress, widget.update_progress)
+    batcher.connect_latest(worker.update_total_videos, widget.update_total_videos)
+    batcher.connect_latest(worker.update_remaining_videos, widget.update_remaining_videos)
+    batcher.connect_finished(worker.finished, widget.on_finished)
+
 def stop_all_video_operations(widget):
     """
     Stop all ongoing video operations.
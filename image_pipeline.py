@@ -0,0 +1,532 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module handles image processing tasks such as converting images to JPG and removing metadata.
+It does not depend on Qt; progress is reported through Event callbacks, which the GUI
+forwards to its worker thread signals and the command line prints.
+"""
+
+import os
+import re
+import time
+import itertools
+import collections
+import multiprocessing
+import concurrent.futures
+from send2trash import send2trash
+from events import Event
+from conversion_manifest import ConversionManifest
+from exiftool_pool import ExifToolPool
+from jpeg_metadata import strip_jpeg_metadata
+from memory_budget import estimate_decoded_bytes, default_budget
+from scanner import ScanStream
+from folder_watcher import FolderWatcher
+from utils import (sanitize_path, convert_single_image, convert_image_chunk, init_image_process,
+                   remove_single_metadata, remove_metadata_batch, is_exiftool_available,
+                   get_save_format, get_encoder_threads, is_save_format_available, EXIFTOOL_PATH,
+                   DEFAULT_ENCODER_PROFILE)
+
+# Formats whose decoding and color conversion mostly hold the GIL, so threads cannot use many cores
+PROCESS_BOUND_EXTENSIONS = ('.heif', '.heic', '.avif', '.png', '.tiff', '.tif', '.gif', '.bmp', '.webp')
+# Share of such files above which the auto backend switches to worker processes
+PROCESS_BOUND_SHARE = 0.25
+# Minimum number of files before starting worker processes pays off
+MIN_FILES_FOR_PROCESSES = 64
+# Maximum number of images sent to a worker process per task
+PROCESS_CHUNK_SIZE = 16
+# Number of JPG files edited by one exiftool command in the batched metadata mode
+METADATA_BATCH_SIZE = 200
+# Tasks kept outstanding per worker, so queued work stays small however many files there are
+IN_FLIGHT_PER_WORKER = 4
+# Number of files looked at before the auto backend decides between threads and processes
+BACKEND_SAMPLE_SIZE = 256
+# How often the result loop wakes up to check the stop flag, in seconds
+STOP_POLL_INTERVAL = 0.2
+# Threads reading image headers ahead of the conversion pool, and how many files they read ahead
+HEADER_WORKERS = 4
+HEADER_PREFETCH_DEPTH = 64
+
+# Result strings of the conversion and metadata functions that mean the file failed
+FAILED_RESULT_PREFIXES = ("Error", "Generated an exception", "ExifTool is not available")
+
+# Savings reported in the "Keeping ..." result of convert_single_image, stored with the kept file
+KEPT_SAVINGS = re.compile(r" saves (-?\d+(?:\.\d+)?)% ")
+
+
+def iter_chunks(items, chunk_size):
+    """Group an iterable into lists of at most chunk_size items without consuming it up front."""
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+class ImagePipeline:
+    def __init__(self, directory, use_max_cores, task, target_format='JPG', backend='auto', metadata_mode='per_file',
+                 use_manifest=True, watch=False, max_dimension=None, memory_budget=None,
+                 profile=DEFAULT_ENCODER_PROFILE, min_savings_percent=None):
+        # Events to report progress, emitted from the thread running the pipeline
+        self.update_status = Event()
+        self.update_status_bar = Event()
+        self.update_progress = Event()
+        self.update_remaining_photos = Event()
+        self.update_total_photos = Event()  # Number of images found by the scan
+        self.update_failed = Event()  # Path of a file that could not be processed
+        self.finished = Event()
+        self.directory = sanitize_path(directory)  # Sanitize the directory path
+        self.use_max_cores = use_max_cores  # Flag to use maximum CPU cores
+        self.task = task  # Task to perform: 'convert' or 'remove_metadata'
+        self.target_format = target_format
+        self.backend = backend  # Conversion pool: 'thread', 'process', or 'auto'
+        self.total_files = None  # Number of files the scan has found so far
+        self.metadata_mode = metadata_mode  # Metadata removal: 'per_file', 'batch', or 'builtin'
+        self.use_manifest = use_manifest  # Skip files the conversion manifest records as done
+        self.manifest = None
+        self.already_converted = 0  # Files skipped this run because the manifest records them as done
+        self.watch = watch  # Keep processing new and changed images after the first run until stopped
+        self.max_dimension = max_dimension  # Scale converted images down to fit this many pixels, or None
+        self.memory_budget = memory_budget  # Bytes of decoded images converted at once, or None for half the RAM
+        self.profile = profile  # Encoder profile: 'fast', 'balanced' or 'archive'
+        self.min_savings_percent = min_savings_percent  # Keep originals the conversion shrinks by less, or None
+        self.kept_originals = 0  # Files kept this run because their conversion did not save enough
+        self.process_stop = None  # multiprocessing.Event shared with the worker processes of the process backend
+        self.watcher = None  # FolderWatcher of watch mode, told about every file the run rewrites
+        self.stop_event = False  # Flag to stop the thread
+
+    def run(self):
+        extensions = ('.jpg',) if self.task == 'remove_metadata' else None
+        watcher = FolderWatcher('image', extensions) if self.watch else None
+        self.watcher = watcher
+        if self.task == 'convert':
+            self.open_manifest()
+        try:
+            stream = self.start_scan(extensions, watcher)
+            try:
+                self.run_task(stream)
+            finally:
+                stream.wait()
+                for folder, error in stream.errors:
+                    self.update_status.emit(f"Could not read folder {folder}: {error}")
+            if watcher is not None:
+                self.watch_folder(watcher)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            self.watcher = None
+            self.close_manifest()
+        self.finished.emit()  # Emit finished signal when done
+
+    def run_task(self, files_to_process):
+        # Determine the task to perform
+        if self.task == 'convert':
+            self.convert_to_jpg(files_to_process, self.use_max_cores)
+        elif self.task == 'remove_metadata':
+            self.remove_metadata(files_to_process, self.use_max_cores)
+
+    def start_scan(self, extensions, watcher=None):
+        """
+        Start scanning the directory in the background and return the ScanStream of the files
+        for the current task. The pool starts on the first files while the scan goes on, and
+        leftovers of interrupted runs are moved to the recycle bin as they are found. In
+        watch mode every folder is handed to the watcher just before it is listed.
+        """
+        self.update_status_bar.emit(f"Scanning {self.directory}...")
+        on_folder = watcher.add_folder if watcher is not None else None
+        return ScanStream(self.directory, 'image', extensions, should_stop=lambda: self.stop_event,
+                          on_found=self.found_files, on_leftover=self.remove_leftover, on_folder=on_folder).start()
+
+    def watch_folder(self, watcher):
+        """
+        Keep processing the images that are added to or changed in the directory until the
+        worker is stopped. Each batch of settled files is run like a small one-shot run.
+        """
+        self.update_status.emit(f"Watching {self.directory} for new images...")
+        while not self.stop_event:
+            files_to_process = watcher.wait_for_files(lambda: self.stop_event)
+            if not files_to_process:
+                continue
+            self.update_status.emit(f"{len(files_to_process)} new or changed images found.")
+            self.found_files(len(files_to_process))
+            self.update_remaining_photos.emit(len(files_to_process))  # A new batch; none of it is done yet
+            self.run_task(files_to_process)
+
+    def found_files(self, count):
+        # Called from the scan thread as files are found
+        self.total_files = count
+        self.update_total_photos.emit(count)
+
+    def remove_leftover(self, temp_file):
+        # Called from the scan thread before any image in the same folder is handed out
+        try:
+            send2trash(temp_file)
+            self.update_status_bar.emit(f"Moved leftover file to recycle bin: {os.path.basename(temp_file)}")
+        except Exception as e:
+            self.update_status.emit(f"Error moving leftover file {temp_file} to recycle bin: {e}")
+
+    def stop(self):
+        self.stop_event = True  # Set stop event flag to True
+        if self.process_stop is not None:
+            self.process_stop.set()  # Seen by the worker processes between the images of a chunk
+
+    def open_manifest(self):
+        """
+        Open the conversion manifest. Conversion continues without it if it cannot be opened.
+        """
+        if not self.use_manifest:
+            return
+        try:
+            self.manifest = ConversionManifest()
+        except Exception as e:
+            self.manifest = None
+            self.update_status.emit(f"Conversion manifest unavailable, checking every file: {e}")
+
+    def close_manifest(self):
+        """
+        Commit and close the conversion manifest.
+        """
+        if self.manifest is not None:
+            try:
+                self.manifest.close()
+            except Exception as e:
+                self.update_status.emit(f"Failed to close conversion manifest: {e}")
+            self.manifest = None
+
+    def iter_unfinished(self, files_to_process, finished_count):
+        """
+        Drop the files the manifest records as already converted to the target format, or as
+        kept by the size guard, so a restarted run never hands them to the pool.
+        finished_count is a one-item list that is incremented for every file dropped.
+        """
+        for file_path in files_to_process:
+            status = None
+            if self.manifest is not None:
+                status = self.manifest.done_status(file_path, self.target_format, self.min_savings_percent)
+            if status is not None:
+                finished_count[0] += 1
+                if status == 'kept':
+                    self.kept_originals += 1
+                else:
+                    self.already_converted += 1
+                self.report_progress(finished_count[0])
+                continue
+            yield file_path
+
+    def mark_written(self, file_path):
+        """
+        Tell the folder watcher that this run has just written file_path, so watch mode does
+        not hand the file out again because of the run's own changes.
+        """
+        if self.watcher is not None:
+            self.watcher.mark_handled(file_path)
+
+    def record_result(self, file_path, result):
+        """
+        Record a conversion result in the manifest.
+        """
+        if self.manifest is None:
+            return
+        try:
+            if result.startswith("Skipping"):
+                self.manifest.record(file_path, file_path, 'skipped', self.target_format)
+            elif result.startswith("Keeping"):
+                # Not converted again while the guard would still keep it
+                saved = KEPT_SAVINGS.search(result)
+                self.manifest.record(file_path, file_path, 'kept', self.target_format,
+                                     float(saved.group(1)) if saved else None)
+            elif result.startswith("Error"):
+                self.manifest.record(file_path, None, 'error', self.target_format)
+            else:
+                self.manifest.record(file_path, result, 'converted', self.target_format)
+        except Exception as e:
+            self.update_status.emit(f"Failed to update conversion manifest for {file_path}: {e}")
+
+    def convert_to_jpg(self, files_to_process, use_max_cores):
+        start_time = time.time()  # Record start time
+        save_format = get_save_format(self.target_format)
+        if not is_save_format_available(save_format):
+            self.update_status.emit(f"Error: {self.target_format} output is not supported by this Pillow build.")
+            self.update_failed.emit(self.directory)
+            return
+        cores = os.cpu_count() if use_max_cores else 2  # Determine number of cores to use
+        # Multithreaded encoders get fewer workers so workers times encoder threads fits the cores
+        encoder_threads = get_encoder_threads(save_format)
+        max_workers = max(1, cores // encoder_threads)
+        processed = [0]  # Shared with iter_unfinished, which counts the files it drops
+        self.already_converted = 0
+        self.kept_originals = 0
+        # Checked against the manifest as the pool asks for work
+        files_to_process = self.iter_unfinished(files_to_process, processed)
+
+        # Look at the first files to pick a backend, then keep streaming the rest
+        sample_size = BACKEND_SAMPLE_SIZE if self.backend == 'auto' else 1
+        sample = list(itertools.islice(files_to_process, sample_size))
+        if not sample:
+            if processed[0]:
+                self.update_status.emit(f"All {processed[0]} images were already converted or kept.")
+            else:
+                self.update_status.emit("No files found to process.")
+            return
+        backend = self.choose_backend(sample, max_workers)
+        files_to_process = itertools.chain(sample, files_to_process)
+        memory_budget = self.memory_budget or default_budget()
+        threads_note = f" x {encoder_threads} encoder threads" if encoder_threads > 1 else ""
+        self.update_status_bar.emit(f"Converting images with {max_workers} {backend} workers{threads_note} "
+                                    f"within {memory_budget / 1024 ** 3:.1f} GB...")
+
+        for file_path, result in self.iter_convert_results(files_to_process, max_workers, backend, memory_budget):
+            self.record_result(file_path, result)
+            if result.startswith("Skipping"):
+                self.update_status_bar.emit(result)  # Update status bar if skipping
+            elif result.startswith("Keeping"):
+                self.kept_originals += 1
+                self.update_status_bar.emit(result)  # Update status bar if the original was kept
+            elif result.startswith(FAILED_RESULT_PREFIXES):
+                self.update_status.emit(result)  # Update status with error
+                self.update_failed.emit(file_path)
+            else:
+                new_file = result  # Get the new file path
+                if os.path.exists(new_file):
+                    self.mark_written(new_file)
+                    self.update_status.emit(f"Completed: {new_file}")  # Update status
+                else:
+                    self.update_status_bar.emit(f"Error: New file does not exist for {new_file}")
+                    self.update_failed.emit(file_path)
+            processed[0] += 1
+            self.report_progress(processed[0])
+
+        end_time = time.time()  # Record end time
+        elapsed_time = end_time - start_time  # Calculate elapsed time
+        summary = (
+            "------------------------------------------\n"
+            f"Conversion Results{' (stopped)' if self.stop_event else ''}:\n\n"
+            f"Total Files: {processed[0]}\n"
+            f"Already Converted (from manifest): {self.already_converted}\n"
+            f"Kept Original (too little saved): {self.kept_originals}\n"
+            f"Completed in {elapsed_time:.2f} seconds!\n"
+            "------------------------------------------\n"
+        )
+        self.update_status.emit(summary)  # Update status with summary
+
+    def report_progress(self, processed):
+        """
+        Emit progress against the number of files found so far. The scan streams, so the
+        total can still grow while the first files are being converted.
+        """
+        total_files = max(self.total_files or 0, processed)
+        self.update_progress.emit(int(processed / total_files * 100))  # Update progress bar
+        self.update_remaining_photos.emit(total_files - processed)  # Update remaining photos count
+
+    def choose_backend(self, sample_files, max_workers):
+        """
+        Pick 'thread' or 'process' for the conversion pool. In auto mode, worker processes are
+        used when there are enough cores and files to pay for starting them, and enough of the
+        sampled files are formats whose decoding and color conversion hold the GIL.
+        """
+        if self.backend in ('thread', 'process'):
+            return self.backend
+        expected_files = max(self.total_files or 0, len(sample_files))
+        if max_workers <= 2 or expected_files < MIN_FILES_FOR_PROCESSES:
+            return 'thread'
+        heavy_files = sum(1 for file_path in sample_files if os.path.splitext(file_path)[1].lower() in PROCESS_BOUND_EXTENSIONS)
+        return 'process' if heavy_files >= len(sample_files) * PROCESS_BOUND_SHARE else 'thread'
+
+    def iter_convert_results(self, files_to_process, max_workers, backend, memory_budget):
+        """
+        Convert the files on the chosen backend and yield (file_path, result) as they complete.
+        The process backend sends the files in chunks to keep inter-process overhead low.
+        Files are admitted by their estimated decoded size, so the conversions running at
+        once never hold more than memory_budget bytes of pixels between them. The budget is
+        reserved when a task is submitted, so no more tasks are submitted than there are
+        workers: every submitted task is running, and queued tasks never hold budget. The
+        header prefetch keeps the next files ready, so a freed worker gets work right away.
+        """
+        max_in_flight = max_workers
+        weights = {}  # file_path -> estimated bytes, filled as the headers are read
+        files_to_process = self.iter_weighed(files_to_process, weights)
+        if backend == 'process':
+            if self.total_files:
+                chunk_size = max(1, min(PROCESS_CHUNK_SIZE, self.total_files // (max_workers * IN_FLIGHT_PER_WORKER)))
+            else:
+                chunk_size = PROCESS_CHUNK_SIZE
+            # Spawned, not forked: the scan and header threads may hold locks a forked child would inherit
+            context = multiprocessing.get_context('spawn')
+            # Set by stop(); running chunks check it between images instead of finishing all of them
+            self.process_stop = context.Event()
+            if self.stop_event:
+                self.process_stop.set()
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_image_process,
+                                                              initargs=(self.process_stop,), mp_context=context)
+            chunks = iter_chunks(files_to_process, chunk_size)
+
+            def chunk_weight(chunk):
+                # A worker process converts its chunk one image at a time
+                return max(weights.pop(file_path) for file_path in chunk)
+
+            for chunk, future in self.iter_bounded(executor, convert_image_chunk, chunks, max_in_flight, self.target_format,
+                                                   self.max_dimension, self.profile, self.min_savings_percent,
+                                                   weigh=chunk_weight, budget=memory_budget):
+                try:
+                    yield from future.result()
+                except Exception as exc:
+                    for file_path in chunk:
+                        yield file_path, f"Error processing {file_path}: {exc}"
+            return
+
+        # Use a ThreadPoolExecutor to process files concurrently
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        for file_path, future in self.iter_bounded(executor, convert_single_image, files_to_process, max_in_flight, self.target_format,
+                                                   self.max_dimension, self.profile, self.min_savings_percent,
+                                                   weigh=weights.pop, budget=memory_budget):
+            try:
+                yield file_path, future.result()
+            except Exception as exc:
+                yield file_path, f"Error processing {file_path}: {exc}"
+
+    def iter_weighed(self, files_to_process, weights):
+        """
+        Yield the files in order, each once its estimated decoded size is in weights. Up to
+        HEADER_PREFETCH_DEPTH headers are read ahead on HEADER_WORKERS threads, so slow
+        storage does not hold up admission.
+        """
+        save_format = get_save_format(self.target_format)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=HEADER_WORKERS)
+        pending = collections.deque()  # (file_path, future), in file order
+        files_iter = iter(files_to_process)
+        try:
+            while not self.stop_event:
+                # Keep the header queue filled up to the prefetch depth
+                while len(pending) < HEADER_PREFETCH_DEPTH:
+                    file_path = next(files_iter, None)
+                    if file_path is None:
+                        break
+                    pending.append((file_path, executor.submit(estimate_decoded_bytes, file_path, save_format, self.max_dimension)))
+                if not pending:
+                    return
+                file_path, future = pending.popleft()
+                weights[file_path] = future.result()
+                yield file_path
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_bounded(self, executor, fn, items, max_in_flight, *args, weigh=None, budget=None):
+        """
+        Submit fn(item, *args) for each item while keeping at most max_in_flight tasks
+        outstanding, and yield (item, future) as they complete. Items are pulled from the
+        iterable only when a slot frees up, so memory stays flat however large the tree is.
+        Owns the executor: on stop, queued tasks are cancelled and the pool is shut down
+        without waiting for them, so only the tasks already running are left to finish.
+
+        With weigh and budget, an item is only submitted while the weights of the submitted
+        items plus its own fit in budget. The budget therefore limits what runs at once only
+        when max_in_flight is not above the executor's worker count. Items that do not fit wait in order, and the first
+        of them keeps its room reserved, so small items keep flowing around a large one
+        without starving it. An item larger than the whole budget runs on its own.
+        """
+        items = iter(items)
+        pending = {}  # future -> (item, weight)
+        waiting = collections.deque()  # (item, weight) pulled but not yet admitted
+        in_use = 0  # Total weight of the pending items
+        exhausted = False
+        try:
+            while not self.stop_event:
+                while len(pending) < max_in_flight:
+                    if waiting and (not pending or in_use + waiting[0][1] <= budget):
+                        item, weight = waiting.popleft()
+                    elif exhausted or len(waiting) >= max_in_flight:
+                        break
+                    else:
+                        item = next(items, None)
+                        if item is None:
+                            exhausted = True
+                            continue
+                        weight = weigh(item) if weigh is not None else 0
+                        reserved = waiting[0][1] if waiting else 0
+                        if budget is not None and pending and in_use + reserved + weight > budget:
+                            waiting.append((item, weight))
+                            continue
+                    pending[executor.submit(fn, item, *args)] = (item, weight)
+                    in_use += weight
+                if not pending:
+                    break
+                # Wake up periodically so a stop request is noticed while every task is busy
+                done, _ = concurrent.futures.wait(pending, timeout=STOP_POLL_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    if self.stop_event:
+                        break
+                    item, weight = pending.pop(future)
+                    in_use -= weight
+                    yield item, future
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=not self.stop_event, cancel_futures=True)
+
+    def remove_metadata(self, files_to_process, use_max_cores):
+        max_workers = os.cpu_count() if use_max_cores else 2  # Determine number of workers
+
+        if self.metadata_mode != 'builtin' and not is_exiftool_available():
+            self.metadata_mode = 'builtin'
+            self.update_status.emit("ExifTool is not available, using the built-in JPG metadata remover.")
+
+        # One resident exiftool process per worker thread, so no file pays exiftool's startup cost
+        exiftool_pool = ExifToolPool(EXIFTOOL_PATH, max_workers) if self.metadata_mode != 'builtin' else None
+
+        # Use a ThreadPoolExecutor to process files concurrently
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        processed = 0
+        try:
+            for file_path, result in self.iter_metadata_results(executor, files_to_process, max_workers, exiftool_pool):
+                self.mark_written(file_path)  # Cleaned in place or replaced by its cleaned copy
+                if "Skipping" in result:
+                    self.update_status_bar.emit(result)  # Update status bar if skipping
+                elif result.startswith(FAILED_RESULT_PREFIXES):
+                    self.update_status.emit(result)  # Update status with error
+                    self.update_failed.emit(file_path)
+                else:
+                    self.update_status.emit(f"Completed: {result}")  # Update status
+                processed += 1
+                self.report_progress(processed)
+        finally:
+            if exiftool_pool is not None:
+                exiftool_pool.close()
+
+        if self.stop_event:
+            self.update_status.emit("Metadata removal stopped.")
+        else:
+            self.update_status.emit("Metadata removal completed.")  # Update status when done
+
+    def iter_metadata_results(self, executor, files_to_process, max_workers, exiftool_pool):
+        """
+        Remove metadata on the executor and yield (file_path, result) as files complete.
+        The batch mode hands METADATA_BATCH_SIZE files to each exiftool command and splits
+        the command's output back into one result per file. The builtin mode rewrites the
+        JPG headers in-process and needs no exiftool at all.
+        """
+        if self.metadata_mode == 'builtin':
+            for file_path, future in self.iter_bounded(executor, strip_jpeg_metadata, files_to_process,
+                                                       max_workers * IN_FLIGHT_PER_WORKER):
+                try:
+                    yield file_path, future.result()
+                except Exception as exc:
+                    yield file_path, f"Generated an exception: {exc}"
+            return
+
+        if self.metadata_mode == 'batch':
+            chunks = iter_chunks(files_to_process, METADATA_BATCH_SIZE)
+            for chunk, future in self.iter_bounded(executor, remove_metadata_batch, chunks, max_workers * 2, exiftool_pool):
+                try:
+                    yield from future.result()
+                except Exception as exc:
+                    for file_path in chunk:
+                        yield file_path, f"Generated an exception: {exc}"
+            return
+
+        for file_path, future in self.iter_bounded(executor, remove_single_metadata, files_to_process,
+                                                   max_workers * IN_FLIGHT_PER_WORKER, exiftool_pool):
+            try:
+                yield file_path, future.result()  # Get the result of the future
+            except Exception as exc:
+                yield file_path, f"Generated an exception: {exc}"
@@ -0,0 +1,82 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module runs video jobs concurrently with a separate slot pool per kind of work,
+so CPU encodes, hardware encodes and copy-only remuxes are limited independently.
+"""
+
+import threading
+import concurrent.futures
+
+# Slot pool names used by the video worker
+CPU_POOL = 'cpu'
+HARDWARE_POOL = 'hardware'
+REMUX_POOL = 'remux'
+
+
+class JobScheduler:
+    """
+    Thread pools keyed by slot pool name. Each pool runs at most its slot limit of jobs
+    at once and accepts a bounded backlog, so submitting blocks instead of queueing the
+    whole library in memory.
+    """
+
+    def __init__(self, slot_limits, backlog_per_slot=2):
+        self.executors = {}
+        self.backlog = {}
+        for pool, limit in slot_limits.items():
+            limit = max(1, int(limit))
+            self.executors[pool] = concurrent.futures.ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"{pool}-job")
+            self.backlog[pool] = threading.Semaphore(limit * (1 + backlog_per_slot))
+        self.condition = threading.Condition()
+        self.outstanding = 0  # Jobs submitted and not yet finished
+        self.stopped = False
+
+    def submit(self, pool, fn, *args):
+        """
+        Queue fn(*args) on the given pool, waiting while the pool's backlog is full.
+        Returns the Future, or None if the scheduler was stopped while waiting.
+        """
+        slots = self.backlog[pool]
+        while not slots.acquire(timeout=0.2):
+            if self.stopped:
+                return None
+        if self.stopped:
+            slots.release()
+            return None
+        with self.condition:
+            self.outstanding += 1
+        future = self.executors[pool].submit(fn, *args)
+        future.add_done_callback(lambda _: self._job_done(slots))
+        return future
+
+    def wait(self):
+        """
+        Block until every submitted job, including jobs submitted by other jobs, has finished.
+        """
+        with self.condition:
+            while self.outstanding and not self.stopped:
+                self.condition.wait(timeout=0.2)
+
+    def stop(self):
+        """
+        Stop accepting jobs and wake up anything waiting on the scheduler.
+        """
+        self.stopped = True
+        with self.condition:
+            self.condition.notify_all()
+
+    def shutdown(self):
+        """
+        Shut down all pools. Queued jobs are cancelled if the scheduler was stopped.
+        """
+        for executor in self.executors.values():
+            executor.shutdown(wait=True, cancel_futures=self.stopped)
+
+    def _job_done(self, slots):
+        slots.release()
+        with self.condition:
+            self.outstanding -= 1
+            self.condition.notify_all()
@@ -0,0 +1,220 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module removes the comment and keyword metadata from JPG files without ExifTool.
+Only the marker segments in front of the image data are parsed and rewritten; the
+compressed scan data is copied to the new file byte for byte, using the kernel's
+file-to-file copy where the platform has one, so no pixels are ever decoded.
+"""
+
+import mmap
+import os
+import re
+import shutil
+import struct
+from send2trash import send2trash
+from utils import sanitize_path
+
+# EXIF IFD0 tags cleared by the metadata removal (XPComment, XPSubject)
+EXIF_TAGS_TO_REMOVE = (0x9C9C, 0x9C9F)
+
+# Size in bytes of one value of each TIFF field type
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+EXIF_HEADER = b'Exif\x00\x00'
+XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+
+# XMP properties cleared by the metadata removal, as elements and as attributes
+XMP_PROPERTIES = rb'(?:dc:subject|dc:title|dc:description|MicrosoftPhoto:LastKeywordXMP)'
+XMP_ELEMENT_PATTERN = re.compile(rb'<(' + XMP_PROPERTIES + rb')\b[^>]*?(?:/>|>.*?</\1\s*>)', re.DOTALL)
+XMP_ATTRIBUTE_PATTERN = re.compile(rb'\s' + XMP_PROPERTIES + rb'\s*=\s*(?:"[^"]*"|\'[^\']*\')')
+
+# Markers without a length field
+STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+
+COM_MARKER = 0xFE
+APP1_MARKER = 0xE1
+SOS_MARKER = 0xDA
+EOI_MARKER = 0xD9
+
+# Buffer size for the portable copy of the scan data
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def strip_jpeg_metadata(file_path):
+    """
+    Remove the comment, XPComment/XPSubject and XMP title/subject/description/keyword
+    metadata from a JPG. The cleaned file is written next to the original, the original is
+    sent to the recycle bin, and the new file takes its place. Files without any of that
+    metadata are left untouched.
+    """
+    file_path = sanitize_path(file_path)
+    temp_output_file = file_path + ".tmp"
+
+    try:
+        with open(file_path, 'rb') as source:
+            if os.fstat(source.fileno()).st_size == 0:
+                raise ValueError("not a JPEG file")
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                header, scan_offset, changed = rewrite_header(data)
+            if not changed:
+                return f"Skipping {file_path}, no metadata to remove."
+
+            with open(temp_output_file, 'wb') as output:
+                output.write(header)
+                output.flush()  # The scan data is written through the descriptor, after the header
+                copy_file_tail(source, output, scan_offset)
+
+        send2trash(file_path)
+        os.replace(temp_output_file, file_path)
+        return f"Removed metadata from {file_path}"
+    except Exception as e:
+        if os.path.exists(temp_output_file):
+            try:
+                os.remove(temp_output_file)
+            except Exception:
+                pass
+        return f"Error processing {file_path}: {e}"
+
+
+def rewrite_header(data):
+    """
+    Walk the marker segments up to the first scan and return (header, scan_offset, changed),
+    where header is the cleaned SOI and segments and scan_offset is where the original
+    continues with the SOS marker.
+    """
+    if data[:2] != b'\xff\xd8':
+        raise ValueError("not a JPEG file")
+
+    segments = [b'\xff\xd8']
+    changed = False
+    position = 2
+    while True:
+        if position + 2 > len(data) or data[position] != 0xFF:
+            raise ValueError(f"corrupt marker at byte {position}")
+        marker_start = position
+        while position < len(data) and data[position] == 0xFF:
+            position += 1  # Skip fill bytes
+        if position >= len(data):
+            raise ValueError("file ends inside a marker")
+        marker = data[position]
+        position += 1
+
+        if marker in (SOS_MARKER, EOI_MARKER):
+            return b''.join(segments), marker_start, changed
+        if marker in STANDALONE_MARKERS:
+            segments.append(bytes((0xFF, marker)))
+            continue
+
+        if position + 2 > len(data):
+            raise ValueError("file ends inside a segment header")
+        length = struct.unpack('>H', data[position:position + 2])[0]
+        segment_end = position + length
+        if length < 2 or segment_end > len(data):
+            raise ValueError(f"corrupt segment length at byte {position}")
+        payload = data[position + 2:segment_end]
+        position = segment_end
+
+        if marker == COM_MARKER:
+            changed = True  # Comments are dropped entirely
+            continue
+        if marker == APP1_MARKER and payload.startswith(EXIF_HEADER):
+            cleaned = strip_exif_tags(payload)
+        elif marker == APP1_MARKER and payload.startswith(XMP_HEADER):
+            cleaned = strip_xmp_properties(payload)
+        else:
+            cleaned = None
+        if cleaned is not None:
+            changed = True
+            payload = cleaned
+        segments.append(bytes((0xFF, marker)) + struct.pack('>H', len(payload) + 2) + payload)
+
+
+def strip_exif_tags(payload):
+    """
+    Remove EXIF_TAGS_TO_REMOVE from IFD0 of an EXIF APP1 payload. The entries are removed
+    in place and their out-of-line values are zeroed, so every other offset stays valid.
+    Returns the new payload, or None if none of the tags are present.
+    """
+    tiff = len(EXIF_HEADER)
+    data = bytearray(payload)
+    if data[tiff:tiff + 2] == b'II':
+        endian = '<'
+    elif data[tiff:tiff + 2] == b'MM':
+        endian = '>'
+    else:
+        return None
+
+    ifd = tiff + struct.unpack(endian + 'I', data[tiff + 4:tiff + 8])[0]
+    if ifd + 2 > len(data):
+        return None
+    count = struct.unpack(endian + 'H', data[ifd:ifd + 2])[0]
+    entries_end = ifd + 2 + count * 12
+    if entries_end + 4 > len(data):
+        return None
+
+    kept = []
+    removed = False
+    for i in range(count):
+        entry = bytes(data[ifd + 2 + i * 12:ifd + 14 + i * 12])
+        tag, field_type, value_count = struct.unpack(endian + 'HHI', entry[:8])
+        if tag not in EXIF_TAGS_TO_REMOVE:
+            kept.append(entry)
+            continue
+        removed = True
+        size = value_count * TIFF_TYPE_SIZES.get(field_type, 1)
+        if size > 4:
+            value_offset = tiff + struct.unpack(endian + 'I', entry[8:12])[0]
+            if value_offset + size <= len(data):
+                data[value_offset:value_offset + size] = bytes(size)
+    if not removed:
+        return None
+
+    next_ifd = bytes(data[entries_end:entries_end + 4])
+    table = struct.pack(endian + 'H', len(kept)) + b''.join(kept) + next_ifd
+    data[ifd:entries_end + 4] = table + bytes(entries_end + 4 - ifd - len(table))
+    return bytes(data)
+
+
+def strip_xmp_properties(payload):
+    """
+    Remove XMP_PROPERTIES from an XMP APP1 payload, written either as elements or as
+    attributes. Returns the new payload, or None if none of the properties are present.
+    """
+    packet = payload[len(XMP_HEADER):]
+    cleaned = XMP_ATTRIBUTE_PATTERN.sub(b'', XMP_ELEMENT_PATTERN.sub(b'', packet))
+    if cleaned == packet:
+        return None
+    return XMP_HEADER + cleaned
+
+
+def copy_file_tail(source, output, offset):
+    """
+    Copy everything in source from offset to the end onto output's current position.
+    Uses copy_file_range or sendfile so the data never passes through Python, and falls
+    back to a buffered copy where neither works for regular files (Windows, macOS).
+    """
+    remaining = os.fstat(source.fileno()).st_size - offset
+    for copy in (_copy_file_range, _sendfile):
+        try:
+            while remaining > 0:
+                copied = copy(source.fileno(), output.fileno(), offset, remaining)
+                if copied == 0:
+                    break
+                offset += copied
+                remaining -= copied
+            return
+        except (AttributeError, OSError):
+            continue  # Not available here, or not for this file system; carry on from offset
+    source.seek(offset)
+    shutil.copyfileobj(source, output, COPY_BUFFER_SIZE)
+
+
+def _copy_file_range(source_fd, output_fd, offset, count):
+    return os.copy_file_range(source_fd, output_fd, count, offset)
+
+
+def _sendfile(source_fd, output_fd, offset, count):
+    return os.sendfile(output_fd, source_fd, offset, count)
@@ -8,6 +8,7 @@ This module initializes the main window of the application using PySide6.
 
 import sys
 import os
+import multiprocessing
 from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QTabWidget
 from PySide6.QtGui import QIcon
 from widgets import ImageProcessingWidget, VideoProcessingWidget
@@ -41,6 +42,7 @@ class MainWindow(QWidget):
         self.setLayout(layout)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Required for the image process pool in the PyInstaller build
     app = QApplication(sys.argv)
     # Set the Fusion style 3 styles available are. Fusion, Windows, WindowsVista
     # the Fusion and Windows both use dark mode according to windows being set to dark mode by default
@@ -0,0 +1,138 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module probes video files with a single ffprobe call and parses the result
+into a MediaInfo record that the video conversion decisions read from.
+"""
+
+import json
+import subprocess
+from dataclasses import asdict, dataclass, field, replace
+
+# Container format name ffprobe reports for MP4/MOV files
+MP4_FORMAT_NAME = "mov,mp4,m4a,3gp,3g2,mj2"
+
+
+def _to_float(value):
+    """Convert an ffprobe number string to float, returning None when missing or invalid."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    """Convert an ffprobe number string to int, returning None when missing or invalid."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class StreamInfo:
+    """A single stream reported by ffprobe."""
+    index: int
+    codec_type: str
+    codec_name: str
+    width: int = None
+    height: int = None
+    channels: int = None
+    bit_rate: int = None
+    duration: float = None
+
+    @classmethod
+    def from_ffprobe(cls, stream):
+        return cls(
+            index=_to_int(stream.get('index')) or 0,
+            codec_type=(stream.get('codec_type') or '').lower(),
+            codec_name=(stream.get('codec_name') or '').lower(),
+            width=_to_int(stream.get('width')),
+            height=_to_int(stream.get('height')),
+            channels=_to_int(stream.get('channels')),
+            bit_rate=_to_int(stream.get('bit_rate')),
+            duration=_to_float(stream.get('duration')),
+        )
+
+
+@dataclass
+class MediaInfo:
+    """Everything the video worker needs to know about a file, from one ffprobe run."""
+    path: str
+    format_name: str = None
+    duration: float = None
+    size: int = None
+    bit_rate: int = None
+    streams: list = field(default_factory=list)
+
+    @classmethod
+    def from_ffprobe(cls, path, data):
+        """Build a MediaInfo from the parsed JSON output of ffprobe."""
+        fmt = data.get('format') or {}
+        format_name = (fmt.get('format_name') or '').lower() or None
+        return cls(
+            path=path,
+            format_name=format_name,
+            duration=_to_float(fmt.get('duration')),
+            size=_to_int(fmt.get('size')),
+            bit_rate=_to_int(fmt.get('bit_rate')),
+            streams=[StreamInfo.from_ffprobe(stream) for stream in data.get('streams') or []],
+        )
+
+    @classmethod
+    def from_dict(cls, path, data):
+        """Rebuild a MediaInfo from the dictionary produced by to_dict."""
+        data = dict(data)
+        streams = [StreamInfo(**stream) for stream in data.pop('streams', [])]
+        data.pop('path', None)
+        return cls(path=path, streams=streams, **data)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary of this record."""
+        return asdict(self)
+
+    def first_stream(self, codec_type):
+        """Return the first stream of the given type ('video' or 'audio'), or None."""
+        for stream in self.streams:
+            if stream.codec_type == codec_type:
+                return stream
+        return None
+
+    @property
+    def video_codec(self):
+        stream = self.first_stream('video')
+        return stream.codec_name if stream and stream.codec_name else None
+
+    @property
+    def audio_codec(self):
+        stream = self.first_stream('audio')
+        return stream.codec_name if stream and stream.codec_name else None
+
+    @property
+    def is_matroska(self):
+        return self.format_name is not None and 'matroska' in self.format_name
+
+    def as_remuxed(self, path):
+        """
+        Return the info for a stream-copied MP4 of this file. Remuxing does not touch
+        the streams, so the new file can be classified without probing it again.
+        """
+        return replace(self, path=path, format_name=MP4_FORMAT_NAME, streams=list(self.streams))
+
+
+def probe_media(ffprobe_path, file_path):
+    """
+    Run ffprobe once for the file and return a MediaInfo record.
+    Raises subprocess.CalledProcessError if ffprobe fails and FileNotFoundError if ffprobe is missing.
+    """
+    result = subprocess.run(
+        [ffprobe_path, '-v', 'error', '-show_streams', '-show_format', '-of', 'json', file_path],
+        capture_output=True, text=True, encoding='utf-8', errors='replace', check=True, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+    )
+    try:
+        data = json.loads(result.stdout or '{}')
+    except json.JSONDecodeError as e:
+        raise subprocess.CalledProcessError(result.returncode, result.args, output=result.stdout, stderr=f"Invalid ffprobe JSON: {e}")
+    return MediaInfo.from_ffprobe(file_path, data)
@@ -0,0 +1,101 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module estimates how much memory converting an image will take, from its header
+alone, and works out the memory budget the image conversion is admitted against. Pillow
+only parses the header when an image is opened, so an estimate costs one small read for
+most formats; HEIF and AVIF files are read whole, since their decoder keeps them in memory.
+"""
+
+import os
+import sys
+import ctypes
+from utils import load_pillow, fit_size, SAVE_FORMAT_MODES
+
+# Share of the physical memory the conversions may use at once when no budget is set
+DEFAULT_BUDGET_SHARE = 0.5
+
+# Budget used when the physical memory cannot be determined
+FALLBACK_BUDGET = 4 * 1024 ** 3
+
+# Bytes Pillow stores per pixel by mode; every other mode is stored in 4 bytes per pixel
+MODE_BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I;16B': 2, 'I;16L': 2, 'I;16N': 2}
+
+# Formats whose decoder holds the whole compressed file in memory next to the pixels
+IN_MEMORY_FORMATS = ('HEIF', 'AVIF')
+
+# Same reducing gap Image.thumbnail uses when it asks the JPEG decoder for a draft
+THUMBNAIL_REDUCING_GAP = 2
+
+
+def estimate_decoded_bytes(file_path, save_format, max_dimension=None):
+    """
+    Return the peak bytes of converting an image: the decoded pixels, at the draft scale
+    JPEG sources are decoded at when downscaling, plus the converted copy when the mode has
+    to change. Only the first frame is converted, so other frames are not counted. Files
+    whose header cannot be read count as 0; their conversion reports the error.
+    """
+    Image = load_pillow()
+    try:
+        with Image.open(file_path) as img:
+            source_format = img.format
+            final_size = img.size
+            if max_dimension and max(img.size) > max_dimension:
+                final_size = fit_size(img.size, max_dimension)
+                # Only changes the decoder setup; nothing is decoded here
+                img.draft(None, tuple(side * THUMBNAIL_REDUCING_GAP for side in final_size))
+            width, height = img.size
+            decoded = width * height * MODE_BYTES_PER_PIXEL.get(img.mode, 4)
+            if final_size != img.size:
+                decoded += final_size[0] * final_size[1] * 4  # Resized copy
+            if img.mode not in SAVE_FORMAT_MODES.get(save_format, ('RGB',)):
+                decoded += final_size[0] * final_size[1] * 4  # Converted copy
+    except Exception:
+        return 0
+    if source_format in IN_MEMORY_FORMATS:
+        try:
+            decoded += os.path.getsize(file_path)
+        except OSError:
+            pass
+    return decoded
+
+
+def get_total_memory():
+    """
+    Return the physical memory of the machine in bytes, or None if it cannot be determined.
+    """
+    if sys.platform == 'win32':
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [
+                ('dwLength', ctypes.c_ulong),
+                ('dwMemoryLoad', ctypes.c_ulong),
+                ('ullTotalPhys', ctypes.c_ulonglong),
+                ('ullAvailPhys', ctypes.c_ulonglong),
+                ('ullTotalPageFile', ctypes.c_ulonglong),
+                ('ullAvailPageFile', ctypes.c_ulonglong),
+                ('ullTotalVirtual', ctypes.c_ulonglong),
+                ('ullAvailVirtual', ctypes.c_ulonglong),
+                ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+        return None
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget():
+    """
+    Return the memory budget used when none is configured: half of the physical memory.
+    """
+    total = get_total_memory()
+    if not total:
+        return FALLBACK_BUDGET
+    return int(total * DEFAULT_BUDGET_SHARE)
@@ -3,16 +3,13 @@ Author: RollinCajun
 Email: kastingwithfrostbyte@proton.me
 
 Description:
-This module handles image processing tasks such as converting images to JPG and removing metadata.
+This module runs the image pipeline on a QThread for the GUI and forwards its events to
+Qt signals, so the widgets are updated through queued connections.
 """
 
-import os
-import time
-import concurrent.futures
-from PIL import Image
-from send2trash import send2trash
 from PySide6.QtCore import QThread, Signal
-from utils import sanitize_path, convert_single_image, remove_single_metadata, is_supported_image_file
+from image_pipeline import ImagePipeline
+from utils import DEFAULT_ENCODER_PROFILE
 
 class ImageWorkerThread(QThread):
     # Signals to update the UI
@@ -20,94 +17,23 @@ class ImageWorkerThread(QThread):
     update_status_bar = Signal(str)
     update_progress = Signal(int)
     update_remaining_photos = Signal(int)
+    update_total_photos = Signal(int)  # Number of images found by the scan
+    update_failed = Signal(str)  # Path of a file that could not be processed
     finished = Signal()
 
-    def __init__(self, directory, use_max_cores, task, target_format='JPG'):
+    def __init__(self, directory, use_max_cores, task, target_format='JPG', backend='auto', metadata_mode='per_file',
+                 use_manifest=True, watch=False, max_dimension=None, memory_budget=None,
+                 profile=DEFAULT_ENCODER_PROFILE, min_savings_percent=None):
         super().__init__()
-        self.directory = sanitize_path(directory)  # Sanitize the directory path
-        self.use_max_cores = use_max_cores  # Flag to use maximum CPU cores
-        self.task = task  # Task to perform: 'convert' or 'remove_metadata'
-        self.target_format = target_format
-        self.stop_event = False  # Flag to stop the thread
+        self.pipeline = ImagePipeline(directory, use_max_cores, task, target_format, backend, metadata_mode,
+                                      use_manifest, watch, max_dimension, memory_budget, profile, min_savings_percent)
+        # Forward every pipeline event to the signal of the same name
+        for name in ('update_status', 'update_status_bar', 'update_progress', 'update_remaining_photos',
+                     'update_total_photos', 'update_failed', 'finished'):
+            getattr(self.pipeline, name).connect(getattr(self, name).emit)
 
     def run(self):
-        # Determine the task to perform
-        if self.task == 'convert':
-            self.convert_to_jpg(self.directory, self.use_max_cores)
-        elif self.task == 'remove_metadata':
-            self.remove_metadata(self.directory, self.use_max_cores)
-        self.finished.emit()  # Emit finished signal when done
+        self.pipeline.run()
 
     def stop(self):
-        self.stop_event = True  # Set stop event flag to True
-
-    def convert_to_jpg(self, directory, use_max_cores):
-        start_time = time.time()  # Record start time
-        # Collect all image files in the directory and subdirectories
-        files_to_process = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files if is_supported_image_file(file)]
-        print(f"Files to process: {files_to_process}")  # Debugging line
-        total_files = len(files_to_process)  # Total number of files to process
-        if total_files == 0:
-            self.update_status.emit("No files found to process.")
-            return
-        max_workers = os.cpu_count() if use_max_cores else 2  # Determine number of workers
-
-        # Use a ThreadPoolExecutor to process files concurrently
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(convert_single_image, file_path, self.target_format): file_path for file_path in files_to_process}
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                if self.stop_event:
-                    break  # Stop processing if stop event is set
-                try:
-                    result = future.result()  # Get the result of the future
-                    print(f"Processing result: {result}")  # Debugging line
-                    if "Skipping" in result:
-                        self.update_status_bar.emit(result)  # Update status bar if skipping
-                    else:
-                        new_file = result  # Get the new file path
-                        print(f"New file: {new_file}")  # Debugging line
-                        if os.path.exists(new_file):
-                            self.update_status.emit(f"Completed: {new_file}")  # Update status
-                        else:
-                            self.update_status_bar.emit(f"Error: New file does not exist for {new_file}")
-                    self.update_progress.emit(int((i + 1) / total_files * 100))  # Update progress bar
-                    self.update_remaining_photos.emit(total_files - (i + 1))  # Update remaining photos count
-                except Exception as exc:
-                    print(f"Error processing file: {futures[future]} - {exc}")  # Debugging line
-                    self.update_status_bar.emit(f"Error: {exc}")  # Update status bar with error
-
-        end_time = time.time()  # Record end time
-        elapsed_time = end_time - start_time  # Calculate elapsed time
-        summary = (
-            "------------------------------------------\n"
-            "Conversion Results:\n\n"
-            f"Total Files: {total_files}\n"
-            f"Completed in {elapsed_time:.2f} seconds!\n"
-            "------------------------------------------\n"
-        )
-        self.update_status.emit(summary)  # Update status with summary
-
-    def remove_metadata(self, directory, use_max_cores):
-        # Collect all JPG files in the directory and subdirectories
-        files_to_process = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files if file.lower().endswith('.jpg')]
-        total_files = len(files_to_process)  # Total number of files to process
-        max_workers = os.cpu_count() if use_max_cores else 2  # Determine number of workers
-
-        # Use a ThreadPoolExecutor to process files concurrently
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(remove_single_metadata, file_path): file_path for file_path in files_to_process}
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                if self.stop_event:
-                    break  # Stop processing if stop event is set
-                try:
-                    result = future.result()  # Get the result of the future
-                    if "Skipping" in result:
-                        self.update_status_bar.emit(result)  # Update status bar if skipping
-                    else:
-                        self.update_status.emit(f"Completed: {result}")  # Update status
-                    self.update_progress.emit(int((i + 1) / total_files * 100))  # Update progress bar
-                    self.update_remaining_photos.emit(total_files - (i + 1))  # Update remaining photos count
-                except Exception as exc:
-                    self.update_status.emit(f"Generated an exception: {exc}")  # Update status with error
-
-        self.update_status.emit("Metadata removal completed.")  # Update status when done
\ No newline at end of file
+        self.pipeline.stop()
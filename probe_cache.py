@@ -0,0 +1,157 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module stores ffprobe results in an SQLite file so unchanged videos can be
+classified on later runs without launching ffprobe again. It also remembers the videos
+whose conversion was discarded for saving too little space, so they are not encoded again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from media_info import MediaInfo
+from utils import get_app_data_dir
+
+# Maximum number of files kept in the cache before the least recently used are evicted
+DEFAULT_MAX_ENTRIES = 200000
+
+# Number of writes collected before they are committed to disk
+COMMIT_INTERVAL = 500
+
+
+def default_cache_path():
+    """
+    Return the path of the probe cache in the user's cache directory.
+    The cache is kept off the media share so SQLite never has to lock a network file.
+    """
+    return os.path.join(get_app_data_dir(), "probe_cache.db")
+
+
+class ProbeCache:
+    """
+    Probe results keyed by (path, size, mtime_ns). A changed size or modification time
+    is treated as a different file, so stale entries are never returned.
+    """
+
+    def __init__(self, db_path=None, max_entries=DEFAULT_MAX_ENTRIES, revalidate=False):
+        self.db_path = db_path or default_cache_path()
+        self.max_entries = max_entries  # Cap on the number of cached files
+        self.revalidate = revalidate  # Ignore cached results and probe every file again
+        self.lock = threading.Lock()
+        self.pending_writes = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "info TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS kept ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "codec TEXT NOT NULL, saved_percent REAL, updated REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get(self, file_path, stat_result):
+        """
+        Return the cached MediaInfo for the file, or None if it is missing, stale, or revalidating.
+        """
+        if self.revalidate:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT info FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (file_path, stat_result.st_size, stat_result.st_mtime_ns)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE probes SET last_used = ? WHERE path = ?", (time.time(), file_path))
+            self._count_write()
+        try:
+            return MediaInfo.from_dict(file_path, json.loads(row[0]))
+        except (TypeError, ValueError):
+            return None
+
+    def put(self, file_path, stat_result, info):
+        """
+        Store the MediaInfo for the file, replacing any older entry for the same path.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO probes (path, size, mtime_ns, info, last_used) VALUES (?, ?, ?, ?, ?)",
+                (file_path, stat_result.st_size, stat_result.st_mtime_ns, json.dumps(info.to_dict()), time.time())
+            )
+            self._count_write()
+
+    def discard(self, file_path):
+        """
+        Remove the entries for a file that was replaced or deleted.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM probes WHERE path = ?", (file_path,))
+            self.connection.execute("DELETE FROM kept WHERE path = ?", (file_path,))
+            self._count_write()
+
+    def is_kept(self, file_path, stat_result, codec, min_savings_percent):
+        """
+        Return True if the file, unchanged since, was kept because converting it to codec
+        saved less than min_savings_percent. Always False while revalidating.
+        """
+        if self.revalidate:
+            return False
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM kept WHERE path = ? AND size = ? AND mtime_ns = ? AND codec = ? AND saved_percent < ?",
+                (file_path, stat_result.st_size, stat_result.st_mtime_ns, codec, min_savings_percent)
+            ).fetchone()
+        return row is not None
+
+    def record_kept(self, file_path, stat_result, codec, saved_percent):
+        """
+        Remember that the conversion of the file to codec was discarded for saving too little space.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO kept (path, size, mtime_ns, codec, saved_percent, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (file_path, stat_result.st_size, stat_result.st_mtime_ns, codec, saved_percent, time.time())
+            )
+            self._count_write()
+
+    def evict(self):
+        """
+        Drop the least recently used entries until the cache is within max_entries, together
+        with the kept records of the files whose probe entries are gone.
+        """
+        with self.lock:
+            count = self.connection.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self.connection.execute(
+                    "DELETE FROM probes WHERE path IN (SELECT path FROM probes ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+            self.connection.execute("DELETE FROM kept WHERE path NOT IN (SELECT path FROM probes)")
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def close(self):
+        """
+        Apply the size cap, commit outstanding writes, and close the database.
+        """
+        self.evict()
+        with self.lock:
+            self.connection.close()
+
+    def _count_write(self):
+        # Commit in batches; the caller holds the lock
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.pending_writes = 0
@@ -0,0 +1,267 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module walks a media folder once with os.scandir and sorts every file it meets into
+videos, images and leftovers of interrupted runs, so the workers never walk the tree
+more than once per run. Folders are listed by a pool of threads that steal work from
+each other, so a network share is scanned with many directory requests in flight, and
+files are handed to the workers while the scan is still going.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from utils import SUPPORTED_IMAGE_EXTENSIONS
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv')
+
+# Number of threads listing folders at once. Each listing is one round trip on a network share,
+# so this is about latency, not CPU
+DEFAULT_SCAN_WORKERS = 8
+
+# Minimum seconds between two found-file reports of a ScanStream
+FOUND_REPORT_INTERVAL = 0.1
+
+# Partial outputs left behind by interrupted encodes and remuxes
+VIDEO_TEMP_SUFFIXES = (".h265.mp4", ".h264.mp4", ".h265.mkv", ".h264.mkv", ".h265", ".h264", ".remuxed.mp4")
+
+# Partial outputs left behind by interrupted image conversions and metadata edits
+IMAGE_TEMP_SUFFIXES = tuple(extension + ".tmp" for extension in SUPPORTED_IMAGE_EXTENSIONS)
+
+
+@dataclass
+class ScanResult:
+    """Everything a single pass over a folder found, by kind."""
+    directory: str
+    videos: list = field(default_factory=list)
+    images: list = field(default_factory=list)
+    video_temp_files: list = field(default_factory=list)
+    image_temp_files: list = field(default_factory=list)
+    errors: list = field(default_factory=list)  # (directory, message) for folders that could not be read
+
+    def images_with_extensions(self, extensions):
+        """Return the images whose extension is one of extensions."""
+        return [file_path for file_path in self.images if file_path.lower().endswith(extensions)]
+
+
+def classify_name(file_name):
+    """
+    Return 'video', 'image', 'video_temp', 'image_temp' or None for a file name.
+    Leftovers are checked first, since a partial encode also ends in a video extension.
+    """
+    lower_name = file_name.lower()
+    if lower_name.endswith(VIDEO_TEMP_SUFFIXES):
+        return 'video_temp'
+    if lower_name.endswith(IMAGE_TEMP_SUFFIXES):
+        return 'image_temp'
+    if lower_name.endswith(VIDEO_EXTENSIONS):
+        return 'video'
+    if lower_name.endswith(SUPPORTED_IMAGE_EXTENSIONS):
+        return 'image'
+    return None
+
+
+def scan_folder(folder, leftovers_before=None):
+    """
+    List one folder. Returns (subfolders, found, error), where found is a list of
+    (kind, path) pairs. Leftovers modified at or after leftovers_before are ignored, since
+    they belong to the run that is going on right now.
+    """
+    subfolders = []
+    found = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    subfolders.append(entry.path)
+                    continue
+                kind = classify_name(entry.name)
+                if kind is None:
+                    continue
+                if kind.endswith('_temp') and leftovers_before is not None:
+                    try:
+                        if entry.stat(follow_symlinks=False).st_mtime >= leftovers_before:
+                            continue
+                    except OSError:
+                        continue
+                found.append((kind, entry.path))
+    except OSError as e:
+        return [], [], str(e)
+    return subfolders, found, None
+
+
+def iter_scan(directory, workers=DEFAULT_SCAN_WORKERS, should_stop=None, leftovers_before=None, on_folder=None):
+    """
+    Walk directory with a pool of scandir threads and yield (folder, found, error) for every
+    folder as soon as it has been listed, in no particular order.
+
+    Each thread keeps its own deque of folders to visit. It works depth-first from the end
+    of its own deque and, when that runs dry, steals the oldest folder from the front of
+    another thread's deque, which tends to be a large subtree close to the root. Symlinked
+    folders are not followed, like os.walk. should_stop is checked between folders, and
+    on_folder, if given, is called with each folder just before it is listed.
+    """
+    workers = max(1, workers)
+    folders = [deque() for _ in range(workers)]
+    folders[0].append(directory)
+    condition = threading.Condition()
+    state = {'outstanding': 1, 'done': False}  # Folders queued or being listed
+    results = queue.Queue()
+
+    def next_folder(index):
+        with condition:
+            while True:
+                if state['done']:
+                    return None
+                if folders[index]:
+                    return folders[index].pop()
+                for offset in range(1, workers):
+                    victim = folders[(index + offset) % workers]
+                    if victim:
+                        return victim.popleft()
+                condition.wait()
+
+    def scan_worker(index):
+        try:
+            while True:
+                folder = next_folder(index)
+                if folder is None:
+                    return
+                if on_folder is not None:
+                    on_folder(folder)
+                subfolders, found, error = scan_folder(folder, leftovers_before)
+                results.put((folder, found, error))
+                with condition:
+                    folders[index].extend(reversed(subfolders))  # Pop them in listing order
+                    state['outstanding'] += len(subfolders) - 1
+                    if state['outstanding'] == 0 or (should_stop is not None and should_stop()):
+                        state['done'] = True
+                    condition.notify_all()
+        finally:
+            results.put(None)
+
+    threads = [threading.Thread(target=scan_worker, args=(index,), daemon=True) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        running = workers
+        while running:
+            item = results.get()
+            if item is None:
+                running -= 1
+                continue
+            yield item
+    finally:
+        with condition:
+            state['done'] = True
+            condition.notify_all()
+
+
+def scan_directory(directory, should_stop=None, workers=DEFAULT_SCAN_WORKERS):
+    """
+    Walk directory and every folder below it once and return a ScanResult. Files are
+    classified by name alone, so nothing is stat'ed beyond what scandir already returns.
+    """
+    result = ScanResult(directory)
+    lists = {
+        'video': result.videos,
+        'image': result.images,
+        'video_temp': result.video_temp_files,
+        'image_temp': result.image_temp_files,
+    }
+    for folder, found, error in iter_scan(directory, workers, should_stop):
+        if error is not None:
+            result.errors.append((folder, error))
+        for kind, file_path in found:
+            lists[kind].append(file_path)
+    return result
+
+
+class ScanStream:
+    """
+    Runs a scan on a background thread and hands the files of one kind to a consumer while
+    the scan is still going. Iterating the stream yields the files as they are found and
+    ends when the scan is done.
+
+    Leftovers of the same kind are passed to on_leftover as their folder is listed, before
+    any file of that folder is handed out, so a leftover is always gone before the file it
+    was made from is processed again. Only leftovers older than the stream are reported.
+    on_found is called with the number of files found so far, at most every
+    FOUND_REPORT_INTERVAL seconds and once more when the scan ends. on_folder is called
+    with each folder just before it is listed, from the scan threads.
+    """
+
+    def __init__(self, directory, kind, extensions=None, workers=DEFAULT_SCAN_WORKERS, should_stop=None,
+                 on_found=None, on_leftover=None, on_folder=None):
+        self.directory = directory
+        self.kind = kind  # 'video' or 'image'
+        self.extensions = extensions  # Only files with these extensions, or every file of the kind
+        self.workers = workers
+        self.should_stop = should_stop
+        self.on_found = on_found
+        self.on_leftover = on_leftover
+        self.on_folder = on_folder
+        self.started = time.time()
+        self.files = []
+        self.errors = []  # (folder, message) for folders that could not be read
+        self.done = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def wait(self):
+        """Block until the scan has finished."""
+        self.thread.join()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self.condition:
+                while index >= len(self.files) and not self.done:
+                    self.condition.wait()
+                if index >= len(self.files):
+                    return
+                batch = self.files[index:]
+            index += len(batch)
+            yield from batch
+
+    def _run(self):
+        last_report = 0.0
+        try:
+            for folder, found, error in iter_scan(self.directory, self.workers, self.should_stop, self.started, self.on_folder):
+                if error is not None:
+                    self.errors.append((folder, error))
+                files = []
+                for kind, file_path in found:
+                    if kind == self.kind + '_temp':
+                        if self.on_leftover is not None:
+                            self.on_leftover(file_path)
+                    elif kind == self.kind and (self.extensions is None or file_path.lower().endswith(self.extensions)):
+                        files.append(file_path)
+                if files:
+                    with self.condition:
+                        self.files.extend(files)
+                        self.condition.notify_all()
+                if self.on_found is not None and time.monotonic() - last_report >= FOUND_REPORT_INTERVAL:
+                    last_report = time.monotonic()
+                    self.on_found(len(self.files))
+        finally:
+            try:
+                if self.on_found is not None:
+                    self.on_found(len(self.files))  # Final count, reported before the consumer can see the end
+            finally:
+                with self.condition:
+                    self.done = True
+                    self.condition.notify_all()
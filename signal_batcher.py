@@ -0,0 +1,82 @@
+"""
+Author: RollinCajun
+Email: kastingwithfrostbyte@proton.me
+
+Description:
+This module sits between the worker threads and the widgets. Worker signals are collected
+in the worker's own thread and delivered to the GUI thread in timed batches, so a busy
+worker costs the GUI one update per interval instead of one per message.
+"""
+
+import threading
+from PySide6.QtCore import QObject, QTimer, Qt, Slot
+
+# How often collected messages are delivered to the widgets
+DEFAULT_INTERVAL_MS = 100
+
+
+class SignalBatcher(QObject):
+    """
+    Coalesces worker signals. Log-style signals are appended to a batch and delivered as one
+    multi-line message; state-style signals (status bar, progress, counts) only deliver the
+    latest value.
+    """
+
+    def __init__(self, parent=None, interval_ms=DEFAULT_INTERVAL_MS):
+        super().__init__(parent)
+        self.lock = threading.Lock()
+        self.appended = {}  # slot -> list of messages since the last flush
+        self.latest = {}  # slot -> latest argument tuple since the last flush
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def connect_appending(self, signal, slot):
+        """
+        Collect every message of a str signal and deliver them joined by newlines.
+        """
+        signal.connect(lambda message: self._append(slot, message), Qt.DirectConnection)
+        self.timer.start()
+
+    def connect_latest(self, signal, slot):
+        """
+        Deliver only the most recent arguments of a signal.
+        """
+        signal.connect(lambda *args: self._set_latest(slot, args), Qt.DirectConnection)
+        self.timer.start()
+
+    def connect_finished(self, signal, slot):
+        """
+        Deliver everything still pending, stop the timer, then call slot.
+        The connection is queued, so slot runs in the GUI thread after the last batch.
+        """
+        signal.connect(self.finish)
+        signal.connect(slot)
+
+    @Slot()
+    def flush(self):
+        """
+        Deliver the collected messages. Runs in the GUI thread.
+        """
+        with self.lock:
+            appended, self.appended = self.appended, {}
+            latest, self.latest = self.latest, {}
+        for slot, messages in appended.items():
+            slot("\n".join(messages))
+        for slot, args in latest.items():
+            slot(*args)
+
+    @Slot()
+    def finish(self):
+        self.flush()
+        self.timer.stop()
+
+    def _append(self, slot, message):
+        # Runs in the emitting worker thread
+        with self.lock:
+            self.appended.setdefault(slot, []).append(message)
+
+    def _set_latest(self, slot, args):
+        # Runs in the emitting worker thread
+        with self.lock:
+            self.latest[slot] = args
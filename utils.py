@@ -8,17 +8,21 @@ removing metadata, and checking for ffprobe availability.
 """
 
 import os
+import math
 import shutil
-from PIL import Image, JpegImagePlugin
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
 import subprocess
-import pillow_heif
 from send2trash import send2trash
+from exiftool_pool import DEFAULT_TIMEOUT as DEFAULT_EXIFTOOL_TIMEOUT
 
-# Register HEIF format with Pillow
-pillow_heif.register_heif_opener()
+# Trace of the file operations; silent unless the application configures logging
+logger = logging.getLogger(__name__)
 
-# Register JFIF format with Pillow
-JpegImagePlugin._getmp = lambda: None
+# Guards the one-time Pillow setup in load_pillow
+_pillow_lock = threading.Lock()
+_pillow_ready = False
 
 SUPPORTED_IMAGE_EXTENSIONS = (
     '.jpg', '.jpeg', '.jpe', '.jfif',
@@ -31,6 +35,67 @@ EXIFTOOL_PATH = shutil.which("exiftool")
 # Variable to store the comment added to image metadata
 COMMENT = "ConvertedByFrostbyte"
 
+# exiftool arguments that clear the tags written by earlier runs
+METADATA_TAG_ARGS = [
+    '-XPComment=',
+    '-XPSubject=',
+    '-XMP-dc:Subject=',
+    '-XMP-dc:Title=',
+    '-XMP-dc:Description=',
+    '-XMP-microsoft:LastKeywordXMP=',
+    '-Comment=',
+]
+
+# Image modes each save format writes as they are; other modes are converted once before saving
+SAVE_FORMAT_MODES = {
+    'JPEG': ('L', 'RGB'),
+    'PNG': ('1', 'L', 'LA', 'I', 'I;16', 'I;16B', 'P', 'RGB', 'RGBA'),
+    'WEBP': ('RGB', 'RGBA'),
+    'AVIF': ('RGB', 'RGBA'),
+    'HEIF': ('RGB', 'RGBA'),
+}
+
+# Source extensions that are already in the format of a target extension
+EQUIVALENT_EXTENSIONS = {'.heif': '.heic'}
+
+# Threads one AVIF or HEIF encode runs internally. Fewer pool workers are started for these
+# formats, so pool workers times encoder threads stays at the number of cores
+ENCODER_THREADS = {'AVIF': 2, 'HEIF': 2}
+
+# Encoder settings per profile and save format. Every profile writes a format at the same
+# quality, so they only trade encoding time for file size: fast skips the extra JPG Huffman
+# pass and uses the quickest WebP/AVIF/HEIF search, archive the slowest and smallest
+ENCODER_PROFILES = {
+    'fast': {
+        'JPEG': {'quality': 75, 'subsampling': '4:2:0', 'optimize': False, 'progressive': False},
+        'PNG': {'compress_level': 1},
+        'WEBP': {'quality': 80, 'method': 0},
+        'AVIF': {'quality': 60, 'speed': 8},
+        'HEIF': {'quality': 60, 'enc_params': {'preset': 'faster'}},
+    },
+    'balanced': {
+        'JPEG': {'quality': 75, 'subsampling': '4:2:0', 'optimize': True, 'progressive': False},
+        'PNG': {'compress_level': 6},
+        'WEBP': {'quality': 80, 'method': 4},
+        'AVIF': {'quality': 60, 'speed': 6},
+        'HEIF': {'quality': 60, 'enc_params': {'preset': 'medium'}},
+    },
+    'archive': {
+        'JPEG': {'quality': 75, 'subsampling': '4:2:0', 'optimize': True, 'progressive': True},
+        'PNG': {'compress_level': 9, 'optimize': True},
+        'WEBP': {'quality': 80, 'method': 6},
+        'AVIF': {'quality': 60, 'speed': 5},
+        'HEIF': {'quality': 60, 'enc_params': {'preset': 'slow'}},
+    },
+}
+DEFAULT_ENCODER_PROFILE = 'balanced'
+
+# Suffix exiftool gives the backup of a file it edits in place
+EXIFTOOL_BACKUP_SUFFIX = "_original"
+
+# Seconds allowed per file when a batch of files is edited in one exiftool command
+METADATA_BATCH_SECONDS_PER_FILE = 5
+
 
 def is_supported_image_file(file_name):
     """Return True if the file has a supported image extension."""
@@ -44,6 +109,8 @@ def get_target_extension(format_name):
         return '.jpg'
     if normalized == 'png':
         return '.png'
+    if normalized in ('heif', 'heic'):
+        return '.heic'
     return '.' + normalized.lstrip('.')
 
 
@@ -54,9 +121,49 @@ def get_save_format(format_name):
         return 'JPEG'
     if normalized == 'png':
         return 'PNG'
+    if normalized in ('heif', 'heic'):
+        return 'HEIF'
     return normalized.upper()
 
 
+def get_encoder_threads(save_format):
+    """Return the number of threads one encode in the given Pillow save format runs."""
+    return ENCODER_THREADS.get(save_format, 1)
+
+
+def is_save_format_available(save_format):
+    """Return True if this Pillow build (with pillow_heif) can write the given save format."""
+    Image = load_pillow()
+    Image.init()
+    return save_format in Image.SAVE
+
+
+def get_app_data_dir():
+    """
+    Return the per-user directory for the application's caches and logs.
+    It is kept off the media folders so network shares never hold databases or logs.
+    """
+    base_dir = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base_dir, "FrostbyteMediaTools")
+
+
+def get_rotating_logger(name, max_bytes=10 * 1024 * 1024, backup_count=5):
+    """
+    Return a logger that writes every message to logs/<name>.log in the app data directory,
+    rotating the file at max_bytes and keeping backup_count old files.
+    """
+    logger = logging.getLogger(f"frostbyte.{name}")
+    if not logger.handlers:
+        log_dir = os.path.join(get_app_data_dir(), "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        handler = RotatingFileHandler(os.path.join(log_dir, f"{name}.log"), maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
 def is_exiftool_available():
     """Return True if exiftool is installed and available on the PATH."""
     return EXIFTOOL_PATH is not None
@@ -67,23 +174,149 @@ def sanitize_path(path):
     """
     return os.path.normpath(os.path.abspath(path))
 
-def convert_single_image(file_path, target_format='JPG'):
+def load_pillow():
+    """
+    Import Pillow on first use, register the HEIF and JFIF handling, and return the Image
+    module. Deferred so that opening the window or the command line does not load libheif.
+    """
+    global _pillow_ready
+    from PIL import Image
+    if _pillow_ready:
+        return Image
+    with _pillow_lock:
+        if not _pillow_ready:
+            from PIL import JpegImagePlugin
+            import pillow_heif
+
+            # Register HEIF format with Pillow
+            pillow_heif.register_heif_opener()
+
+            # Register JFIF format with Pillow
+            JpegImagePlugin._getmp = lambda: None
+            _pillow_ready = True
+    return Image
+
+# multiprocessing.Event set when the conversion is stopped; only set in image worker processes
+_stop_requested = None
+
+
+def init_image_process(stop_requested=None):
+    """
+    Initializer for image worker processes. Registers the HEIF opener and loads every Pillow
+    plugin up front, so the first image each process receives does not pay for it.
+    stop_requested is checked between the images of a chunk.
+    """
+    global _stop_requested
+    _stop_requested = stop_requested
+    load_pillow().init()
+
+
+def get_save_options(save_format, profile=DEFAULT_ENCODER_PROFILE):
+    """
+    Return the Pillow save parameters of an encoder profile for a save format, including
+    the thread limit of encoders that run threads of their own.
+    """
+    options = dict(ENCODER_PROFILES[profile].get(save_format, {}))
+    threads = ENCODER_THREADS.get(save_format)
+    if save_format == 'AVIF':
+        options['max_threads'] = threads
+    elif save_format == 'HEIF':
+        options['enc_params'] = dict(options.get('enc_params', {}), **{'x265:pools': str(threads)})
+    return options
+
+
+def encode_image(file_path, output_file, save_format, max_dimension=None, profile=DEFAULT_ENCODER_PROFILE):
+    """
+    Decode an image and write it to output_file in the given Pillow save format, with the
+    encoder settings of the given profile.
+    With max_dimension, larger images are scaled down to fit within it. JPEG sources are
+    then decoded at 1/2, 1/4 or 1/8 scale by the decoder itself (draft mode) and reduced
+    before resampling, so the full-size image is never held in memory.
+    """
+    Image = load_pillow()
+    with Image.open(file_path) as img:
+        if max_dimension and max(img.size) > max_dimension:
+            # The exact target size, not a square box, so draft() can pick the smallest scale that still covers it
+            img.thumbnail(fit_size(img.size, max_dimension), Image.Resampling.LANCZOS)  # draft() + reduce() + resample
+        prepare_for_save(img, save_format).save(output_file, save_format, **get_save_options(save_format, profile))
+
+
+def fit_size(size, max_dimension):
+    """
+    Return the size that fits size within max_dimension on its longer side. The shorter
+    side is rounded up, so Image.thumbnail keeps the longer side exactly at max_dimension.
+    """
+    width, height = size
+    scale = max_dimension / max(width, height)
+    if width >= height:
+        return max_dimension, math.ceil(height * scale)
+    return math.ceil(width * scale), max_dimension
+
+
+def prepare_for_save(img, save_format):
+    """
+    Return img in a mode save_format can write. Images already in such a mode are returned
+    as they are, so no second full-size copy is made; anything else takes one conversion.
+    Transparency is kept where the format supports it, and 16-bit greyscale is scaled to
+    8 bits instead of being clipped to white.
+    """
+    modes = SAVE_FORMAT_MODES.get(save_format, ('RGB',))
+    if img.mode in modes:
+        return img
+    if img.mode.startswith('I;16') or img.mode == 'I':
+        img = img.point(lambda value: value * (1 / 256)).convert('L')
+        return img if 'L' in modes else img.convert('RGB')
+    has_alpha = img.mode in ('RGBA', 'RGBa', 'LA', 'La', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+    if img.mode in ('1', 'L', 'LA', 'La', 'F') and 'L' in modes:
+        return img.convert('LA' if has_alpha and 'LA' in modes else 'L')
+    return img.convert('RGBA' if has_alpha and 'RGBA' in modes else 'RGB')
+
+
+def savings_percent(original_size, new_size):
+    """
+    Return how much smaller new_size is than original_size, in percent. Negative if it is larger.
+    """
+    if not original_size:
+        return 0.0
+    return (original_size - new_size) / original_size * 100
+
+
+def convert_image_chunk(file_paths, target_format='JPG', max_dimension=None, profile=DEFAULT_ENCODER_PROFILE,
+                        min_savings_percent=None):
+    """
+    Convert a chunk of images in one task and return a list of (file_path, result) pairs.
+    Used by the process pool backend so each task amortizes the inter-process round trip.
+    Once the conversion is stopped the rest of the chunk is left alone and not returned,
+    so a stop waits for at most one image per worker.
+    """
+    results = []
+    for file_path in file_paths:
+        if _stop_requested is not None and _stop_requested.is_set():
+            break
+        results.append((file_path, convert_single_image(file_path, target_format, max_dimension, profile,
+                                                        min_savings_percent)))
+    return results
+
+
+def convert_single_image(file_path, target_format='JPG', max_dimension=None, profile=DEFAULT_ENCODER_PROFILE,
+                         min_savings_percent=None):
     """
     Convert a single image to the selected target format and safely replace the original.
-    If the image already matches the target format, it will be skipped.
+    If the image already matches the target format, it will be skipped. With max_dimension,
+    the converted image is scaled down to fit within max_dimension pixels on its longer side.
+    profile names the encoder settings in ENCODER_PROFILES. With min_savings_percent, a
+    converted file that is not at least that much smaller is discarded and the original kept.
     """
     try:
         file_path = sanitize_path(file_path)  # Sanitize the file path
-        print(f"Sanitized file path: {file_path}")  # Debugging line
         if not os.path.exists(file_path):
-            print(f"File not found: {file_path}")  # Debugging line
             raise FileNotFoundError(f"The system cannot find the file specified: {file_path}")
 
         target_ext = get_target_extension(target_format)
         source_ext = os.path.splitext(file_path)[1].lower()
         output_file = os.path.splitext(file_path)[0] + target_ext
 
-        if source_ext == target_ext:
+        if EQUIVALENT_EXTENSIONS.get(source_ext, source_ext) == target_ext:
             return f"Skipping {file_path}, already {target_format}."
 
         temp_output_file = output_file + ".tmp"
@@ -91,63 +324,64 @@ def convert_single_image(file_path, target_format='JPG'):
         success = False
 
         try:
-            with Image.open(file_path) as img:
-                img.convert("RGB").save(temp_output_file, save_format)
-                print(f"Created temporary file: {temp_output_file}")  # Debugging line
+            encode_image(file_path, temp_output_file, save_format, max_dimension, profile)
+            logger.debug("Created temporary file: %s", temp_output_file)
 
             if not os.path.exists(temp_output_file):
                 raise FileNotFoundError(f"Converted file was not created: {temp_output_file}")
 
+            if min_savings_percent is not None:
+                saved = savings_percent(os.path.getsize(file_path), os.path.getsize(temp_output_file))
+                if saved < min_savings_percent:
+                    # The finally block removes the temporary file
+                    return (f"Keeping {file_path}, {target_format} output saves {saved:.1f}% "
+                            f"(minimum {min_savings_percent:g}%).")
+
             os.replace(temp_output_file, output_file)
-            print(f"Renamed temporary file to final output: {output_file}")
+            logger.debug("Renamed temporary file to final output: %s", output_file)
             success = True
 
             if os.path.normcase(os.path.normpath(file_path)) != os.path.normcase(os.path.normpath(output_file)):
                 send2trash(file_path)
-                print(f"Sent original file to recycle bin: {file_path}")
+                logger.debug("Sent original file to recycle bin: %s", file_path)
             return output_file
         finally:
             if not success and os.path.exists(temp_output_file):
                 try:
                     os.remove(temp_output_file)
-                    print(f"Removed incomplete temporary file: {temp_output_file}")
+                    logger.debug("Removed incomplete temporary file: %s", temp_output_file)
                 except Exception as cleanup_error:
-                    print(f"Failed to remove incomplete temp file {temp_output_file}: {cleanup_error}")
+                    logger.warning("Failed to remove incomplete temp file %s: %s", temp_output_file, cleanup_error)
     except FileNotFoundError as fnf_error:
-        print(f"FileNotFoundError: {fnf_error}")  # Debugging line
         return f"Error processing {file_path}: {fnf_error}"
     except Exception as e:
-        print(f"Error processing {file_path}: {e}")  # Debugging line
         return f"Error processing {file_path}: {e}"
     return None
 
-def remove_single_metadata(file_path):
+def remove_single_metadata(file_path, exiftool_pool=None):
     """
     Remove all metadata from a single image file.
+    If an ExifToolPool is given the edit runs on one of its resident exiftool processes,
+    otherwise a new exiftool process is started for the file.
     """
     if not is_exiftool_available():
         return f"ExifTool is not available, cannot remove metadata from {file_path}."
 
     file_path = sanitize_path(file_path)
     temp_output_file = file_path + ".tmp"
+    args = ['-o', temp_output_file] + METADATA_TAG_ARGS + [file_path]
 
     try:
-        subprocess.run(
-            [
-                EXIFTOOL_PATH,
-                '-o', temp_output_file,
-                '-XPComment=',
-                '-XPSubject=',
-                '-XMP-dc:Subject=',
-                '-XMP-dc:Title=',
-                '-XMP-dc:Description=',
-                '-XMP-microsoft:LastKeywordXMP=',
-                '-Comment=',
-                file_path
-            ],
-            check=True,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        if exiftool_pool is not None:
+            _, stderr = exiftool_pool.execute(args)
+            if 'Error' in stderr:
+                raise subprocess.CalledProcessError(1, EXIFTOOL_PATH, stderr=stderr)
+        else:
+            subprocess.run(
+                [EXIFTOOL_PATH] + args,
+                check=True,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+            )
 
         if not os.path.exists(temp_output_file):
             raise FileNotFoundError(f"Metadata-stripped file not created: {temp_output_file}")
@@ -161,7 +395,7 @@ def remove_single_metadata(file_path):
                 os.remove(temp_output_file)
             except Exception:
                 pass
-        return f"Error removing metadata from {file_path}: {e}"
+        return f"Error removing metadata from {file_path}: {e.stderr.strip() if e.stderr else e}"
     except Exception as e:
         if os.path.exists(temp_output_file):
             try:
@@ -170,6 +404,74 @@ def remove_single_metadata(file_path):
                 pass
         return f"Error processing {file_path}: {e}"
 
+def remove_metadata_batch(file_paths, exiftool_pool=None):
+    """
+    Remove metadata from many JPG files with one exiftool command and return a list of
+    (file_path, result) pairs. exiftool edits the files in place and keeps each original as
+    <file>_original; once the command is done every backup is sent to the recycle bin, so
+    the originals stay recoverable just like in the per-file mode. Per-file errors are read
+    back from exiftool's "Error: <message> - <file>" lines.
+    """
+    if not is_exiftool_available():
+        return [(file_path, f"ExifTool is not available, cannot remove metadata from {file_path}.") for file_path in file_paths]
+
+    file_paths = [sanitize_path(file_path) for file_path in file_paths]
+    # exiftool will not replace a backup that is already there, so those files go through the per-file path
+    batch = [file_path for file_path in file_paths if not os.path.exists(file_path + EXIFTOOL_BACKUP_SUFFIX)]
+    args = METADATA_TAG_ARGS + batch
+    timeout = DEFAULT_EXIFTOOL_TIMEOUT + METADATA_BATCH_SECONDS_PER_FILE * len(batch)
+
+    failure = None
+    stderr = ''
+    if batch:
+        try:
+            if exiftool_pool is not None:
+                _, stderr = exiftool_pool.execute(args, timeout)
+            else:
+                # Arguments are passed on stdin so the batch is not limited by the command line length
+                completed = subprocess.run(
+                    [EXIFTOOL_PATH, '-charset', 'filename=utf8', '-@', '-'],
+                    input='\n'.join(args).encode('utf-8'),
+                    capture_output=True,
+                    timeout=timeout,
+                    creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+                )
+                stderr = completed.stderr.decode('utf-8', errors='replace')
+        except Exception as e:
+            failure = e
+
+    errors = {}
+    for line in stderr.splitlines():
+        message, separator, error_path = line.rpartition(' - ')
+        if separator and message.startswith('Error'):
+            errors[os.path.normcase(os.path.normpath(error_path.strip()))] = message
+
+    results = []
+    for file_path in file_paths:
+        if file_path not in batch:
+            results.append((file_path, remove_single_metadata(file_path, exiftool_pool)))
+            continue
+        backup_file = file_path + EXIFTOOL_BACKUP_SUFFIX
+        error = errors.get(os.path.normcase(os.path.normpath(file_path)))
+        try:
+            if os.path.exists(backup_file):
+                if not os.path.exists(file_path):
+                    # exiftool was stopped between moving the original aside and writing the new file
+                    os.replace(backup_file, file_path)
+                    results.append((file_path, f"Error removing metadata from {file_path}: {failure or 'output was not written'}"))
+                    continue
+                send2trash(backup_file)
+                results.append((file_path, f"Removed metadata from {file_path}"))
+            elif error:
+                results.append((file_path, f"Error removing metadata from {file_path}: {error}"))
+            elif failure:
+                results.append((file_path, f"Error removing metadata from {file_path}: {failure}"))
+            else:
+                results.append((file_path, f"Skipping {file_path}, no metadata to remove."))
+        except Exception as e:
+            results.append((file_path, f"Error processing {file_path}: {e}"))
+    return results
+
 def is_ffprobe_available():
     """
     Check if ffprobe is available in the system's PATH.
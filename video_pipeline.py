@@ -0,0 +1,922 @@
+import os
+import subprocess
+import time
+import collections
+import queue
+import threading
+import concurrent.futures
+from send2trash import send2trash
+from dataclasses import replace
+from datetime import datetime
+from events import Event
+from utils import sanitize_path, savings_percent
+from media_info import probe_media
+from probe_cache import ProbeCache
+from job_scheduler import JobScheduler, CPU_POOL, HARDWARE_POOL, REMUX_POOL
+from encode_progress import FfmpegProgressParser, HandBrakeProgressParser, BatchProgress
+from scanner import ScanStream, classify_name
+from folder_watcher import FolderWatcher
+
+# ffmpeg arguments for quiet, machine-readable progress on stdout
+FFMPEG_PROGRESS_ARGS = ['-hide_banner', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1']
+
+class VideoPipeline:
+    """
+    Converts the videos in a directory to H.265 or H.264. Qt-free: progress is reported
+    through Event callbacks, emitted from the thread running the pipeline.
+    """
+
+    def __init__(self, directory, use_gpu, use_handbrake, use_amd, codec, use_probe_cache=True, revalidate_cache=False,
+                 probe_workers=4, prefetch_depth=16, cpu_jobs=1, hardware_jobs=1, remux_jobs=2, triage_first=True,
+                 watch=False, min_savings_percent=None):
+        # Events to report progress
+        self.update_status = Event()
+        self.update_status_bar = Event()
+        self.update_ffmpeg_output = Event()
+        self.update_progress = Event()
+        self.update_remaining_videos = Event()
+        self.update_total_videos = Event()  # Number of videos found by the scan
+        self.update_encode_progress = Event()  # EncodeProgress for a running job
+        self.update_failed = Event()  # Path of a file that could not be processed
+        self.finished = Event()
+        self.directory = sanitize_path(directory)  # Sanitize the directory path
+        self.use_gpu = use_gpu  # Flag to use GPU for processing
+        self.use_handbrake = use_handbrake  # Flag to use HandBrakeCLI
+        self.use_amd = use_amd  # Flag to use AMD encoding
+        self.codec = codec  # Codec to use for conversion ('h265' or 'h264')
+        self.stop_event = False  # Flag to stop the thread
+        self.media_info = {}  # Probe results for this run, keyed by file path
+        self.use_probe_cache = use_probe_cache  # Flag to reuse probe results from earlier runs
+        self.revalidate_cache = revalidate_cache  # Flag to probe every file again and refresh the cache
+        self.probe_cache = None
+        self.probe_workers = probe_workers  # Number of ffprobe processes run ahead of the encoder (0 = probe inline)
+        self.prefetch_depth = prefetch_depth  # Number of files classified ahead of the encoder
+        self.cpu_jobs = cpu_jobs  # Number of CPU encodes run at once
+        self.hardware_jobs = hardware_jobs  # Number of GPU encodes run at once (NVENC/VCE session limit)
+        self.remux_jobs = remux_jobs  # Number of copy-only remuxes run at once
+        self.triage_first = triage_first  # Flag to classify everything and finish all remuxes before encoding
+        self.watch = watch  # Keep processing new and changed videos after the first run until stopped
+        self.min_savings_percent = min_savings_percent  # Keep originals an encode shrinks by less, or None
+        self.scheduler = None
+        self.watcher = None  # FolderWatcher of watch mode, told about every file the run writes
+        self.stats = collections.Counter()  # Per-run counts for the summary
+        self.progress_lock = threading.Lock()  # Guards the finished file count shared by concurrent jobs
+        self.total_files = 0
+        self.completed_files = 0
+        self.active_fractions = {}  # Fraction done of each running job, for the progress bar
+        self.highest_percent = 0.0  # Highest batch percent emitted, so the progress bar never moves back
+        self.batch_progress = BatchProgress()
+        self.error_log_file = sanitize_path(os.path.join(directory, "error_log.txt"))  # Path to the error log file
+
+        # Path to ffprobe in the resources folder
+        self.ffprobe_path = sanitize_path(os.path.join(os.path.dirname(__file__), "resources", "ffprobe.exe"))
+        # Path to ffmpeg in the resources folder
+        self.ffmpeg_path = sanitize_path(os.path.join(os.path.dirname(__file__), "resources", "ffmpeg.exe"))
+        # Path to HandBrakeCLI in the resources folder
+        self.handbrake_cli_path = sanitize_path(os.path.join(os.path.dirname(__file__), "resources", "HandBrakeCLI.exe"))
+
+    def run(self):
+        watcher = FolderWatcher('video') if self.watch else None
+        self.watcher = watcher
+        self.open_probe_cache()
+        try:
+            self.update_status_bar.emit(f"Scanning {self.directory}...")
+            # One background scan finds the videos and the leftovers; processing starts on the first videos found
+            stream = ScanStream(self.directory, 'video', should_stop=lambda: self.stop_event,
+                                on_found=self.found_videos, on_leftover=self.clean_temp_file,
+                                on_folder=watcher.add_folder if watcher is not None else None).start()
+            try:
+                self.process_videos(stream, self.use_gpu, self.use_handbrake, self.use_amd)  # Process the videos
+            finally:
+                stream.wait()
+                for folder, error in stream.errors:
+                    self.log_error(folder, error)
+                    self.update_status.emit(f"Could not read folder {folder}: {error}")
+            if watcher is not None:
+                self.watch_folder(watcher)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            self.watcher = None
+            self.close_probe_cache()
+        self.finished.emit()  # Emit finished signal when done
+
+    def watch_folder(self, watcher):
+        """
+        Keep processing the videos that are added to or changed in the directory until the
+        worker is stopped. Each batch of settled files is run like a small one-shot run.
+        """
+        self.update_status.emit(f"Watching {self.directory} for new videos...")
+        while not self.stop_event:
+            files_to_process = watcher.wait_for_files(lambda: self.stop_event)
+            if not files_to_process:
+                continue
+            self.update_status.emit(f"{len(files_to_process)} new or changed videos found.")
+            with self.progress_lock:
+                self.total_files = len(files_to_process)
+            self.update_total_videos.emit(len(files_to_process))
+            self.update_remaining_videos.emit(len(files_to_process))  # A new batch; none of it is done yet
+            self.process_videos(files_to_process, self.use_gpu, self.use_handbrake, self.use_amd)
+
+    def open_probe_cache(self):
+        """
+        Open the on-disk probe cache. Processing continues without it if it cannot be opened.
+        """
+        if not self.use_probe_cache:
+            return
+        try:
+            self.probe_cache = ProbeCache(revalidate=self.revalidate_cache)
+        except Exception as e:
+            self.probe_cache = None
+            self.log_error(self.directory, f"Probe cache unavailable: {e}")
+            self.update_status.emit(f"Probe cache unavailable, probing all files: {e}")
+
+    def close_probe_cache(self):
+        """
+        Commit and close the probe cache, evicting the oldest entries over the size cap.
+        """
+        if self.probe_cache is not None:
+            try:
+                self.probe_cache.close()
+            except Exception as e:
+                self.log_error(self.directory, f"Failed to close probe cache: {e}")
+            self.probe_cache = None
+
+    def stop(self):
+        self.stop_event = True  # Set stop event flag to True
+        scheduler = self.scheduler
+        if scheduler is not None:
+            scheduler.stop()  # Drop queued jobs; running jobs terminate their processes
+
+    def clean_temp_file(self, temp_file):
+        """
+        Move a leftover temporary file found by the scan to the recycle bin. Called from the
+        scan thread before any video in the same folder is handed out.
+        """
+        try:
+            send2trash(sanitize_path(temp_file))
+            self.update_status_bar.emit(f"Moved leftover file to recycle bin: {os.path.basename(temp_file)}")
+        except Exception as e:
+            self.log_error(temp_file, e)
+
+    def found_videos(self, count):
+        """
+        Record how many videos the scan has found so far. Called from the scan thread.
+        """
+        with self.progress_lock:
+            self.total_files = max(self.total_files, count)
+        self.update_total_videos.emit(count)
+
+    def process_videos(self, files_to_process, use_gpu, use_handbrake, use_amd):
+        """
+        Process the video files found by the scan. files_to_process may still be growing,
+        in which case the first files are classified while the scan goes on.
+        """
+        start_time = time.time()  # Record start time
+        files_to_process = (sanitize_path(file_path) for file_path in files_to_process)
+        self.completed_files = 0
+        self.active_fractions = {}
+        self.highest_percent = 0.0
+        self.batch_progress = BatchProgress()
+        self.stats = collections.Counter()
+        scheduler = JobScheduler({CPU_POOL: self.cpu_jobs, HARDWARE_POOL: self.hardware_jobs, REMUX_POOL: self.remux_jobs})
+        self.scheduler = scheduler
+        try:
+            if self.triage_first:
+                self.process_triaged(scheduler, files_to_process, use_gpu, use_handbrake, use_amd)
+            else:
+                self.process_pipelined(scheduler, files_to_process, use_gpu, use_handbrake, use_amd)
+        finally:
+            if self.stop_event:
+                scheduler.stop()
+            scheduler.shutdown()
+            self.scheduler = None
+
+        self.update_status.emit(self.build_summary(time.time() - start_time))  # Update status with summary
+        self.update_status_bar.emit("Video processing completed.")  # Update status bar when done
+
+    def process_pipelined(self, scheduler, files_to_process, use_gpu, use_handbrake, use_amd):
+        """
+        Queue each file as soon as it is classified, so encoding starts right away.
+        """
+        for file_path, action, error in self.iter_classified(files_to_process):
+            if self.stop_event:
+                break  # Stop processing if stop event is set
+            if self.finish_without_job(file_path, action, error):
+                continue
+            self.batch_progress.add(self.job_duration(file_path))
+            scheduler.submit(self.pool_for(action, use_gpu), self.run_job, scheduler, file_path, action, use_gpu, use_handbrake, use_amd)
+
+        scheduler.wait()  # Wait for the running and queued jobs to finish
+
+    def process_triaged(self, scheduler, files_to_process, use_gpu, use_handbrake, use_amd):
+        """
+        Classify the whole tree first, then drain every copy-only remux before starting any encode,
+        so quick container fixes never wait behind long encodes.
+        """
+        self.update_status.emit("Classifying videos as they are found...")
+        fast_work = []  # (file_path, action) pairs that copy the video stream
+        encode_work = []
+        for file_path, action, error in self.iter_classified(files_to_process):
+            if self.stop_event:
+                return  # Stop processing if stop event is set
+            if self.finish_without_job(file_path, action, error):
+                continue
+            self.batch_progress.add(self.job_duration(file_path))
+            if action == 'convert':
+                encode_work.append(file_path)
+            else:
+                fast_work.append((file_path, action))
+        self.update_status.emit(f"Classification done: {len(fast_work)} to remux or fix audio, {len(encode_work)} to convert.")
+
+        # Fast path: remuxes and audio-only transcodes. Remuxed files that still need encoding join the encode queue.
+        fast_path_start = time.time()
+        follow_ups = []
+        for file_path, action in fast_work:
+            if self.stop_event:
+                return
+            scheduler.submit(REMUX_POOL, self.run_job, scheduler, file_path, action, use_gpu, use_handbrake, use_amd, follow_ups)
+        scheduler.wait()
+        self.stats['fast_path_seconds'] = time.time() - fast_path_start
+
+        for file_path in encode_work + follow_ups:
+            if self.stop_event:
+                return
+            scheduler.submit(self.encode_pool(use_gpu), self.run_job, scheduler, file_path, 'convert', use_gpu, use_handbrake, use_amd)
+        scheduler.wait()
+
+    def finish_without_job(self, file_path, action, error):
+        """
+        Handle files that need no job: classification errors and skips. Returns True if the file was handled.
+        """
+        if error is not None:
+            self.log_error(file_path, error)  # Log any errors
+            self.update_status.emit(f"Error converting {file_path}: {error}")
+            self.count_stat('errors')
+            self.update_failed.emit(file_path)
+        elif action in ('skip', 'kept'):
+            self.process_file(file_path, action, None, None, None)
+        else:
+            return False
+        self.file_finished()
+        return True
+
+    def encode_pool(self, use_gpu):
+        """
+        Return the slot pool that full encodes run in.
+        """
+        return HARDWARE_POOL if use_gpu else CPU_POOL
+
+    def pool_for(self, action, use_gpu):
+        """
+        Return the slot pool for an action. Remuxes and audio-only transcodes copy the
+        video stream, so they share the remux pool instead of waiting for an encoder slot.
+        """
+        if action in ('remux', 'audio'):
+            return REMUX_POOL
+        return self.encode_pool(use_gpu)
+
+    def run_job(self, scheduler, file_path, action, use_gpu, use_handbrake, use_amd, deferred=None):
+        """
+        Run one scheduled job. A remuxed file that still needs work is queued in the pool for
+        its next action; full encodes are appended to deferred instead when encodes must wait
+        for the remux fast path. A next action in the pool this job runs in is done right here:
+        the job holds one of that pool's backlog permits, so submitting to it could wait forever.
+        """
+        handed_on = False  # The file went on to another job or to deferred, which finish it
+        try:
+            while not self.stop_event:
+                duration = self.job_duration(file_path)
+                self.batch_progress.update(file_path, duration, 0)
+                try:
+                    follow_up = self.process_file(file_path, action, use_gpu, use_handbrake, use_amd)
+                finally:
+                    self.batch_progress.finish(file_path, duration)
+                if not follow_up or self.stop_event:
+                    return
+                with self.progress_lock:
+                    self.active_fractions.pop(file_path, None)
+                next_path, next_action = follow_up
+                self.batch_progress.add(self.job_duration(next_path))
+                if deferred is not None and next_action == 'convert':
+                    deferred.append(next_path)
+                    handed_on = True
+                    return
+                next_pool = self.pool_for(next_action, use_gpu)
+                if next_pool != self.pool_for(action, use_gpu):
+                    # None if the scheduler was stopped while waiting, then the file is finished here
+                    handed_on = scheduler.submit(next_pool, self.run_job, scheduler, next_path, next_action,
+                                                 use_gpu, use_handbrake, use_amd, deferred) is not None
+                    return
+                file_path, action = next_path, next_action
+        finally:
+            # Every exit, including a stop before the job started, drops the job's share of the progress bar
+            with self.progress_lock:
+                self.active_fractions.pop(file_path, None)
+            if not handed_on:
+                self.file_finished()
+
+    def count_stat(self, key, amount=1):
+        """
+        Add to a run statistic. Safe to call from concurrent jobs.
+        """
+        with self.progress_lock:
+            self.stats[key] += amount
+
+    def build_summary(self, elapsed_time):
+        """
+        Build the end-of-run summary, including how much work the remux fast path handled.
+        """
+        fast_path_gb = self.stats['fast_path_bytes'] / (1024 ** 3)
+        fast_path = f"{self.stats['fast_path']} files ({fast_path_gb:.2f} GB)"
+        if self.triage_first:
+            fast_path += f" in {self.stats['fast_path_seconds']:.2f} seconds"
+        return (
+            "------------------------------------------\n"
+            "Video Processing Results:\n\n"
+            f"Total Files: {self.total_files}\n"
+            f"Skipped: {self.stats['skipped']}\n"
+            f"Remux Fast Path: {fast_path}\n"
+            f"Remuxed Then Converted: {self.stats['remuxed'] - self.stats['fast_path']}\n"
+            f"Audio Only (video copied): {self.stats['audio_only']}\n"
+            f"Converted: {self.stats['converted']}\n"
+            f"Kept Original (too little saved): {self.stats['kept']}\n"
+            f"Errors: {self.stats['errors']}\n"
+            f"Completed in {elapsed_time:.2f} seconds!\n"
+            "------------------------------------------\n"
+        )
+
+    def file_finished(self):
+        """
+        Count a finished file and update the progress signals. Safe to call from concurrent jobs.
+        """
+        with self.progress_lock:
+            self.completed_files += 1
+            completed = self.completed_files
+            total_files = max(self.total_files, completed)  # The scan may not have reported the latest files yet
+            self.update_ffmpeg_output.emit(f"Progress: {completed}/{total_files}")  # Update ffmpeg output
+            self.update_progress.emit(int(self.batch_percent()))  # Update progress bar
+            self.update_remaining_videos.emit(total_files - completed)  # Update remaining videos count
+
+    def batch_percent(self):
+        """
+        Return the percent done of the batch: the finished files plus the fraction done of
+        every running job. Never lower than a value returned before, so the progress bar does
+        not move back when a job finishes or the scan finds more files. The caller holds progress_lock.
+        """
+        total_files = max(self.total_files, self.completed_files)
+        if total_files:
+            done = self.completed_files + sum(self.active_fractions.values())
+            self.highest_percent = max(self.highest_percent, min(100.0, done / total_files * 100))
+        return self.highest_percent
+
+    def iter_classified(self, files_to_process):
+        """
+        Yield (file_path, action, error) for each file in order. Up to prefetch_depth files are
+        probed ahead on a pool of probe_workers threads, so the encoder does not wait on ffprobe.
+        The files are pulled from files_to_process on a separate thread, so a slow scan does not
+        hold back probes that have already finished.
+        """
+        if self.probe_workers <= 0:
+            for file_path in files_to_process:
+                if self.stop_event:
+                    return
+                yield self.classify_safely(file_path)
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.probe_workers)
+        pending = queue.Queue()  # Submitted probes in file order, then None when the scan is done
+        slots = threading.Semaphore(max(1, self.prefetch_depth))  # Bounds how far the probes run ahead
+        finished = threading.Event()  # Set when the consumer is done, so the feeder stops pulling
+
+        def feed():
+            # Pull from the scan on its own thread, so a finished probe is handed out right away
+            # instead of waiting for the scanner to find the next file
+            try:
+                for file_path in files_to_process:
+                    while not slots.acquire(timeout=0.2):
+                        if self.stop_event or finished.is_set():
+                            return
+                    if self.stop_event or finished.is_set():
+                        return
+                    try:
+                        pending.put(executor.submit(self.classify_safely, file_path))
+                    except RuntimeError:  # The executor was shut down by the consumer
+                        return
+            finally:
+                pending.put(None)
+
+        threading.Thread(target=feed, daemon=True).start()
+        try:
+            while not self.stop_event:
+                try:
+                    future = pending.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if future is None:
+                    return
+                result = future.result()
+                slots.release()
+                if self.stop_event:
+                    return
+                yield result
+        finally:
+            finished.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def classify_safely(self, file_path):
+        """
+        Classify a file, returning (file_path, action, error) instead of raising.
+        """
+        self.update_status_bar.emit(f"Checking file: {file_path}")  # Debug log
+        try:
+            return file_path, self.classify(file_path), None
+        except Exception as e:
+            return file_path, None, e
+
+    def classify(self, file_path):
+        """
+        Decide what to do with a file: 'skip', 'remux' (fix the container first), 'audio'
+        (video is already the target codec, only the audio needs converting to AAC), 'convert',
+        or 'kept' (an earlier encode saved too little space, so the original was kept).
+        """
+        if not self.is_correct_container(file_path):
+            return 'remux'
+        if not self.is_codec(file_path, self.codec):
+            return 'kept' if self.was_kept(file_path) else 'convert'
+        audio_codec = self.get_audio_codec(file_path)
+        if audio_codec is not None and not self.is_default_audio(audio_codec):
+            self.update_status_bar.emit(f"Audio codec {audio_codec} is not default for {file_path}, converting audio to AAC")
+            return 'audio'
+        if not file_path.lower().endswith('.mp4'):
+            return 'remux'
+        return 'skip'
+
+    def process_file(self, file_path, action, use_gpu, use_handbrake, use_amd):
+        """
+        Remux or convert a single classified file, replacing the original on success.
+        Returns (remuxed_path, action) for a remuxed file that still needs work, otherwise None.
+        """
+        try:
+            if action == 'skip':
+                self.update_status.emit(f"Skipping {file_path}, already {self.codec.upper()} with compatible audio")
+                self.update_status_bar.emit(f"Skipping {file_path}, already {self.codec.upper()} with compatible audio")
+                self.count_stat('skipped')
+                return None
+
+            if action == 'kept':
+                message = f"Skipping {file_path}, an earlier {self.codec.upper()} encode did not save enough space"
+                self.update_status.emit(message)
+                self.update_status_bar.emit(message)
+                self.count_stat('kept')
+                return None
+
+            self.update_status_bar.emit(f"Processing {file_path}")
+            if action == 'remux':
+                self.update_status_bar.emit(f"Remuxing {file_path} to correct MP4 container without re-encoding...")
+                source_size = os.path.getsize(file_path)
+                self.remux_to_mp4_container(file_path)
+                if self.stop_event:
+                    return None  # Leave the partial output for clean_temp_files
+                self.rename_and_cleanup(file_path, 'remuxed')
+                self.update_status.emit(f"{file_path} remuxed to correct MP4 container!")
+                self.count_stat('remuxed')
+                remuxed_path = sanitize_path(os.path.splitext(file_path)[0] + ".mp4")
+                self.remember_remuxed(file_path, remuxed_path)
+                next_action = self.classify(remuxed_path)
+                if next_action != 'skip':
+                    return remuxed_path, next_action
+                self.media_info.pop(remuxed_path, None)
+                self.count_stat('fast_path')
+                self.count_stat('fast_path_bytes', source_size)
+                return None
+
+            if action == 'audio':
+                self.update_status_bar.emit(f"Converting audio of {file_path} to AAC, copying the video stream...")
+                output_file = self.transcode_audio_only(file_path, self.codec)
+                if self.stop_event:
+                    return None  # Leave the partial output for clean_temp_files
+                output_info = self.verify_output(file_path, output_file, self.codec)
+                final_file = self.rename_and_cleanup(file_path, self.codec)
+                if final_file:
+                    self.store_probe_result(final_file, output_info)
+                self.update_status.emit(f"{file_path} audio converted to AAC!")
+                self.count_stat('audio_only')
+                return None
+
+            self.update_status_bar.emit(f"Converting {file_path} to {self.codec.upper()}...")
+            if use_handbrake:
+                output_file = self.convert_with_handbrake(file_path, use_gpu, use_amd, self.codec)
+            else:
+                output_file = self.convert_with_ffmpeg(file_path, use_gpu, use_amd, self.codec)
+            if self.stop_event:
+                return None  # Leave the partial output for clean_temp_files
+            output_info = self.verify_output(file_path, output_file, self.codec)
+            if self.keep_original(file_path, output_file, output_info):
+                return None
+            final_file = self.rename_and_cleanup(file_path, self.codec)
+            if final_file:
+                self.store_probe_result(final_file, output_info)
+            self.update_status.emit(f"{file_path} converted to {self.codec.upper()}!")
+            self.count_stat('converted')
+        except Exception as e:
+            self.log_error(file_path, e)  # Log any errors
+            self.update_status.emit(f"Error converting {file_path}: {e}")
+            self.count_stat('errors')
+            self.update_failed.emit(file_path)
+        finally:
+            self.media_info.pop(file_path, None)  # Keep the per-run probe results bounded
+        return None
+
+    def is_video_file(self, file):
+        """
+        Check if the file is a video file based on its extension.
+        """
+        return classify_name(file) == 'video'
+
+    def probe_media(self, file_path):
+        """
+        Probe the file once with ffprobe and remember the result for the rest of the run.
+        Returns None if the file could not be probed.
+        """
+        if file_path in self.media_info:
+            return self.media_info[file_path]
+
+        stat_result = None
+        if self.probe_cache is not None:
+            try:
+                stat_result = os.stat(file_path)
+                info = self.probe_cache.get(file_path, stat_result)
+            except Exception as e:
+                self.log_error(file_path, f"Probe cache lookup failed: {e}")
+                info = None
+            if info is not None:
+                self.media_info[file_path] = info
+                return info
+
+        try:
+            info = probe_media(self.ffprobe_path, file_path)
+            self.update_status_bar.emit(f"Probed {file_path}: video={info.video_codec}, audio={info.audio_codec}, format={info.format_name}")
+            if stat_result is not None:
+                self.probe_cache.put(file_path, stat_result, info)
+        except FileNotFoundError as e:
+            self.log_error(file_path, e)
+            self.log_error(file_path, f"Environment PATH: {os.environ['PATH']}")
+            raise e
+        except subprocess.CalledProcessError as e:
+            self.log_error(file_path, e)
+            self.log_error(file_path, f"ffprobe error output: {e.stderr}")
+            info = None
+        except Exception as e:
+            self.log_error(file_path, e)
+            info = None
+        self.media_info[file_path] = info
+        return info
+
+    def store_probe_result(self, file_path, info):
+        """
+        Record the probe result of a file this run just wrote, so the next run can skip it without probing.
+        """
+        if self.probe_cache is None or info is None:
+            return
+        try:
+            self.probe_cache.put(file_path, os.stat(file_path), replace(info, path=file_path))
+        except Exception as e:
+            self.log_error(file_path, f"Probe cache update failed: {e}")
+
+    def forget_probe_result(self, file_path):
+        """
+        Drop the cached probe result of a file that no longer exists.
+        """
+        if self.probe_cache is None:
+            return
+        try:
+            self.probe_cache.discard(file_path)
+        except Exception as e:
+            self.log_error(file_path, f"Probe cache update failed: {e}")
+
+    def is_codec(self, file_path, codec):
+        """
+        Check if the video file is encoded in the specified codec format.
+        """
+        info = self.probe_media(file_path)
+        detected_codec = info.video_codec if info else None
+        if codec == 'h265':
+            return detected_codec in ('hevc', 'h265')
+        if codec == 'h264':
+            return detected_codec == 'h264'
+        return False
+
+    def get_audio_codec(self, file_path):
+        """
+        Return the codec name for the first audio stream in the file.
+        """
+        info = self.probe_media(file_path)
+        return info.audio_codec if info else None
+
+    def is_default_audio(self, audio_codec):
+        """
+        Determine whether the audio codec is the default platform-compatible codec.
+        """
+        return audio_codec in ('aac', 'aac_latm')
+
+    def get_format_name(self, file_path):
+        """
+        Return the container format name (e.g., 'matroska', 'mov,mp4,m4a,3gp,3g2,mj2', etc.).
+        """
+        info = self.probe_media(file_path)
+        return info.format_name if info else None
+
+    def is_correct_container(self, file_path):
+        """
+        Check if the file has the correct container format for its extension.
+        MP4 files should be in mov,mp4,m4a,3gp,3g2,mj2 format, not matroska.
+        """
+        if not file_path.lower().endswith('.mp4'):
+            return True
+
+        format_name = self.get_format_name(file_path)
+        if format_name is None:
+            return True
+
+        if 'matroska' in format_name:
+            self.update_status_bar.emit(f"File {file_path} has incorrect container (matroska in mp4), will remux to correct format")
+            return False
+
+        return True
+
+    def remember_remuxed(self, file_path, remuxed_path):
+        """
+        Carry the probe result of a file over to its remuxed MP4. Remuxing copies the
+        streams unchanged, so the remuxed file does not need to be probed again.
+        """
+        info = self.media_info.pop(file_path, None)
+        if info is not None:
+            self.media_info[remuxed_path] = info.as_remuxed(remuxed_path)
+            self.store_probe_result(remuxed_path, self.media_info[remuxed_path])
+
+    def verify_output(self, source_path, output_file, codec):
+        """
+        Probe the converted file once and make sure it holds the requested codec and
+        the full duration of the source before the original is replaced.
+        Returns the MediaInfo of the converted file.
+        """
+        try:
+            output_info = probe_media(self.ffprobe_path, output_file)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Verification failed: ffprobe could not read {output_file}: {e.stderr}")
+
+        expected = ('hevc', 'h265') if codec == 'h265' else ('h264',)
+        if output_info.video_codec not in expected:
+            raise RuntimeError(f"Verification failed: {output_file} has video codec {output_info.video_codec}, expected {codec}")
+
+        source_info = self.media_info.get(source_path)
+        if source_info and source_info.duration and output_info.duration is not None:
+            tolerance = max(1.0, source_info.duration * 0.02)
+            if output_info.duration < source_info.duration - tolerance:
+                raise RuntimeError(
+                    f"Verification failed: {output_file} is {output_info.duration:.1f}s long, source is {source_info.duration:.1f}s"
+                )
+
+        return output_info
+
+    def keep_original(self, file_path, output_file, output_info):
+        """
+        Discard the encode and keep the original if the encode is not at least
+        min_savings_percent smaller, by file size and, when both are known, by overall
+        bitrate. The decision is stored in the probe cache, so the file
+        is not encoded again while it stays unchanged. Returns True if the original was kept.
+        """
+        if self.min_savings_percent is None:
+            return False
+        saved = savings_percent(os.path.getsize(file_path), os.path.getsize(output_file))
+        source_info = self.media_info.get(file_path)
+        bit_rates = ""
+        if source_info and source_info.bit_rate and output_info.bit_rate:
+            # The overall bitrates cover every stream per second of playback, so they agree with the
+            # sizes unless a container or stream layout change skews one of them; count the lower savings
+            saved = min(saved, savings_percent(source_info.bit_rate, output_info.bit_rate))
+            bit_rates = f", {source_info.bit_rate // 1000} kb/s -> {output_info.bit_rate // 1000} kb/s"
+        if saved >= self.min_savings_percent:
+            return False
+
+        os.remove(output_file)
+        message = (f"Keeping {file_path}, {self.codec.upper()} encode saves {saved:.1f}% "
+                   f"(minimum {self.min_savings_percent:g}%{bit_rates})")
+        self.update_status.emit(message)
+        self.update_status_bar.emit(message)
+        self.count_stat('kept')
+        if self.probe_cache is not None:
+            try:
+                self.probe_cache.record_kept(file_path, os.stat(file_path), self.codec, saved)
+            except Exception as e:
+                self.log_error(file_path, f"Probe cache update failed: {e}")
+        return True
+
+    def was_kept(self, file_path):
+        """
+        Return True if the probe cache records that converting the unchanged file saved less
+        than min_savings_percent. A lower minimum than before retries the file.
+        """
+        if self.probe_cache is None or self.min_savings_percent is None:
+            return False
+        try:
+            return self.probe_cache.is_kept(file_path, os.stat(file_path), self.codec, self.min_savings_percent)
+        except Exception as e:
+            self.log_error(file_path, f"Probe cache lookup failed: {e}")
+            return False
+
+    def convert_with_handbrake(self, file_path, use_gpu, use_amd, codec):
+        """
+        Convert the video file to the specified codec format using HandBrakeCLI.
+        """
+        output_file = sanitize_path(os.path.splitext(file_path)[0] + f".{codec}.mp4")
+        encoder = 'x265' if codec == 'h265' else 'x264'
+        if use_gpu:
+            if use_amd:
+                encoder = 'vce_h265' if codec == 'h265' else 'vce_h264'
+            else:
+                encoder = 'nvenc_h265' if codec == 'h265' else 'nvenc_h264'
+        command = [self.handbrake_cli_path, '-i', file_path, '-o', output_file, '--encoder', encoder, '--audio', '1,1', '--aencoder', 'av_aac', '--optimize', '--no-markers', '--json']
+
+        parser = HandBrakeProgressParser(file_path, self.job_duration(file_path))
+        # HandBrake writes its log to the same pipe, so only forward errors and the completion line
+        self.run_encoder_process(file_path, command, parser, keywords=["ERROR", "Error", "error", "Complete"])
+        return output_file
+
+    def remux_to_mp4_container(self, file_path):
+        """
+        Remux video/audio streams to correct MP4 container without re-encoding.
+        """
+        output_file = sanitize_path(os.path.splitext(file_path)[0] + ".remuxed.mp4")
+        command = [
+            self.ffmpeg_path, *FFMPEG_PROGRESS_ARGS, '-i', file_path,
+            '-c:v', 'copy', '-c:a', 'copy', '-movflags', '+faststart', output_file
+        ]
+
+        self.run_encoder_process(file_path, command, FfmpegProgressParser(file_path, self.job_duration(file_path)))
+
+        if not os.path.exists(output_file):
+            raise FileNotFoundError(f"Remuxing failed: Output file not created for {file_path}")
+
+        return output_file
+
+    def transcode_audio_only(self, file_path, codec):
+        """
+        Convert only the audio to AAC, copying the video stream that is already in the target codec.
+        """
+        output_file = sanitize_path(os.path.splitext(file_path)[0] + f".{codec}.mp4")
+        command = [
+            self.ffmpeg_path, *FFMPEG_PROGRESS_ARGS, '-i', file_path,
+            '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k', '-movflags', '+faststart', output_file
+        ]
+
+        self.run_encoder_process(file_path, command, FfmpegProgressParser(file_path, self.job_duration(file_path)))
+
+        if not os.path.exists(output_file):
+            raise FileNotFoundError(f"Audio conversion failed: Output file not created for {file_path}")
+
+        return output_file
+
+    def convert_with_ffmpeg(self, file_path, use_gpu, use_amd, codec):
+        """
+        Convert the video file to the specified codec format using ffmpeg.
+        """
+        output_file = sanitize_path(os.path.splitext(file_path)[0] + f".{codec}.mp4")
+        if codec == 'h265':
+            if use_gpu:
+                encoder = 'hevc_nvenc'
+                command = [
+                    self.ffmpeg_path, *FFMPEG_PROGRESS_ARGS, '-hwaccel', 'cuda', '-i', file_path,
+                    '-c:v', encoder, '-preset', 'medium', '-cq', '23', '-c:a', 'aac', '-b:a', '192k', '-movflags', '+faststart', output_file
+                ]
+            else:
+                encoder = 'libx265'
+                command = [
+                    self.ffmpeg_path, *FFMPEG_PROGRESS_ARGS, '-i', file_path,
+                    '-c:v', encoder, '-preset', 'medium', '-crf', '23', '-c:a', 'aac', '-b:a', '192k', '-movflags', '+faststart', output_file
+                ]
+        else:  # codec == 'h264'
+            if use_gpu:
+                encoder = 'h264_nvenc'
+                command = [
+                    self.ffmpeg_path, *FFMPEG_PROGRESS_ARGS, '-hwaccel', 'cuda', '-i', file_path,
+                    '-c:v', encoder, '-preset', 'medium', '-cq', '23', '-c:a', 'aac', '-b:a', '192k', '-movflags', '+faststart', output_file
+                ]
+            else:
+                encoder = 'libx264'
+                command = [
+                    self.ffmpeg_path, *FFMPEG_PROGRESS_ARGS, '-i', file_path,
+                    '-c:v', encoder, '-preset', 'medium', '-crf', '23', '-c:a', 'aac', '-b:a', '192k', '-movflags', '+faststart', output_file
+                ]
+
+        self.run_encoder_process(file_path, command, FfmpegProgressParser(file_path, self.job_duration(file_path)))
+
+        # Verify if the output file was created
+        if not os.path.exists(output_file):
+            raise FileNotFoundError(f"Conversion failed: Output file not created for {file_path}")
+
+        return output_file
+
+    def run_encoder_process(self, file_path, command, parser, keywords=None):
+        """
+        Run an ffmpeg/HandBrakeCLI command, turning its progress output into update_encode_progress
+        signals. Other output lines are forwarded as text, optionally only those containing a keyword.
+        The process is terminated when the stop event is set.
+        """
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        try:
+            while True:
+                if self.stop_event:
+                    process.terminate()
+                    break
+                output = process.stdout.readline()
+                if output == '' and process.poll() is not None:
+                    break
+                if not output:
+                    continue
+                progress = parser.feed(output)
+                if progress is False:
+                    line = output.strip()
+                    if line and (keywords is None or any(keyword in line for keyword in keywords)):
+                        self.update_ffmpeg_output.emit(f"{os.path.basename(file_path)}: {line}")
+                elif progress is not None:
+                    self.report_progress(progress)
+        finally:
+            if process.stdout is not None:
+                process.stdout.close()
+            process.wait()
+
+    def job_duration(self, file_path):
+        """
+        Return the probed duration of a file in seconds, or None if it is unknown.
+        """
+        info = self.media_info.get(file_path)
+        return info.duration if info else None
+
+    def report_progress(self, progress):
+        """
+        Add the batch-wide figures to a job's progress update and emit it.
+        """
+        self.batch_progress.update(progress.file_path, self.job_duration(progress.file_path), progress.out_time)
+        progress.batch_eta_seconds = self.batch_progress.eta_seconds()
+        with self.progress_lock:
+            if progress.percent is not None:
+                self.active_fractions[progress.file_path] = progress.percent / 100
+            progress.batch_percent = self.batch_percent() if self.total_files else None
+        self.update_encode_progress.emit(progress)
+        if progress.batch_percent is not None:
+            self.update_progress.emit(int(progress.batch_percent))  # Move the progress bar during long encodes
+
+    def rename_and_cleanup(self, file_path, codec):
+        """
+        Remove the original file, then rename the converted file to the original file name.
+        Returns the final file path, or None if the converted file was not found.
+        """
+        old_file = sanitize_path(file_path)
+        if codec == 'remuxed':
+            converted_candidate_mkv = None
+            converted_candidate_mp4 = sanitize_path(os.path.splitext(file_path)[0] + ".remuxed.mp4")
+        else:
+            converted_candidate_mkv = sanitize_path(os.path.splitext(file_path)[0] + f".{codec}.mkv")
+            converted_candidate_mp4 = sanitize_path(os.path.splitext(file_path)[0] + f".{codec}.mp4")
+        final_file = sanitize_path(os.path.splitext(file_path)[0] + ".mp4")
+
+        if converted_candidate_mkv and os.path.exists(converted_candidate_mkv):
+            new_file = converted_candidate_mkv
+        elif os.path.exists(converted_candidate_mp4):
+            new_file = converted_candidate_mp4
+        else:
+            self.update_status.emit(f"Error: Converted file not found for {file_path}. Skipping cleanup.")
+            self.update_failed.emit(file_path)
+            return None
+
+        if os.path.exists(old_file):
+            for attempt in range(5):
+                try:
+                    send2trash(old_file)
+                    self.update_status_bar.emit(f"Moved original to recycle bin: {old_file}")
+                    break
+                except OSError as e:
+                    if attempt == 4:
+                        raise
+                    time.sleep(0.2)
+
+        os.replace(new_file, final_file)
+        if self.watcher is not None:
+            self.watcher.mark_handled(final_file)  # Not handed out again for this run's own write
+        self.update_status_bar.emit(f"Converted and renamed {new_file} to {final_file}")
+        if old_file != final_file:
+            self.forget_probe_result(old_file)
+        return final_file
+
+    def log_error(self, file_path, error):
+        """
+        Log any errors that occur during processing to the error log file.
+        """
+        with open(self.error_log_file, 'a', encoding='utf-8') as log_file:
+            log_file.write(f"{datetime.now()}: Error processing {file_path} - {error}\n")
+            if isinstance(error, subprocess.CalledProcessError):
+                log_file.write(f"Command: {error.cmd}\n")
+                log_file.write(f"Return Code: {error.returncode}\n")
+                log_file.write(f"Output: {error.output}\n")
\ No newline at end of file
@@ -6,20 +6,46 @@ Description:
 This module contains the GUI widgets for image and video processing using PySide6.
 """
 
+import os
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
-                               QPushButton, QFileDialog, QTextEdit, QCheckBox, 
+                               QPushButton, QFileDialog, QPlainTextEdit, QCheckBox, 
                                QProgressBar, QMessageBox, QStatusBar)
-from PySide6.QtWidgets import QComboBox
+from PySide6.QtWidgets import QComboBox, QSpinBox
 from PySide6.QtCore import Qt
 from handlers import (browse_directory, start_image_conversion, start_metadata_removal, 
                       stop_all_image_operations, start_video_processing, stop_all_video_operations)
 from PySide6.QtGui import QTextCursor
+from encode_progress import format_seconds
+from signal_batcher import SignalBatcher
+from utils import get_rotating_logger
+
+# Number of lines each log pane keeps on screen; the full history goes to the log files
+MAX_LOG_LINES = 5000
+
+class BoundedLogView(QPlainTextEdit):
+    """
+    Read-only plain-text log pane capped at max_lines lines. Every message is also written
+    to a rotating log file, so memory and append time stay flat on long runs.
+    """
+
+    def __init__(self, log_name, max_lines=MAX_LOG_LINES):
+        super().__init__()
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)  # Oldest lines are dropped past this count
+        self.file_logger = get_rotating_logger(log_name)
+
+    def append_message(self, message):
+        # Append the message, scroll to the end, and keep the full history on disk
+        self.appendPlainText(message)
+        self.moveCursor(QTextCursor.End)
+        self.file_logger.info(message)
 
 class ImageProcessingWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.init_ui()
         self.worker_thread = None
+        self.signal_batcher = SignalBatcher(self)  # Delivers worker signals in timed batches
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -39,16 +65,82 @@ class ImageProcessingWidget(QWidget):
         # Checkbox for using max CPU cores
         self.use_max_cores_checkbox = QCheckBox("Use Max CPU Cores")
         self.use_max_cores_checkbox.setToolTip("Enable this option to use the maximum number of CPU cores for processing.")
+        self.use_manifest_checkbox = QCheckBox("Skip Files Already Converted")
+        self.use_manifest_checkbox.setChecked(True)
+        self.use_manifest_checkbox.setToolTip("Remember finished conversions, so an interrupted run can be restarted without checking those images again.<br><br>A file is only skipped while its size and content are unchanged.")
+        self.watch_checkbox = QCheckBox("Keep Watching for New Files")
+        self.watch_checkbox.setToolTip("Keep the worker running after the first pass and process new or changed files once they have stopped changing, until Stop All is pressed.<br><br>Files are picked up after a few seconds without changes, so copies still in progress are not touched.")
 
         # Output format selector
         format_layout = QHBoxLayout()
         format_label = QLabel("Output Format:")
         self.format_selector = QComboBox()
-        self.format_selector.addItems(["JPG", "PNG"])  # Default JPG
-        self.format_selector.setToolTip("Select output image format for converted files.")
+        self.format_selector.addItems(["JPG", "PNG", "WebP", "AVIF", "HEIF"])  # Default JPG
+        self.format_selector.setToolTip(
+            "Select output image format for converted files.\n"
+            "WebP, AVIF and HEIF are smaller than JPG but much slower to encode; AVIF and HEIF\n"
+            "encoders run several threads each, so fewer files are converted at once."
+        )
         format_layout.addWidget(format_label)
         format_layout.addWidget(self.format_selector)
 
+        # Encoder profile selector
+        profile_label = QLabel("Profile:")
+        self.profile_selector = QComboBox()
+        self.profile_selector.addItems(["Fast", "Balanced", "Archive"])
+        self.profile_selector.setCurrentText("Balanced")  # Default Balanced
+        self.profile_selector.setToolTip("Select how much time the encoder spends on making files smaller.<br><br>Fast writes JPG without the extra optimization pass and PNG at the lowest compression level, for staging.<br>Balanced optimizes JPG and uses the default PNG compression.<br>Archive adds progressive JPG and the smallest PNG output, at several times the CPU cost.<br>JPG quality is the same in every profile.")
+        format_layout.addWidget(profile_label)
+        format_layout.addWidget(self.profile_selector)
+
+        # Optional downscale of converted images
+        max_dimension_label = QLabel("Max Size:")
+        self.max_dimension_spinbox = QSpinBox()
+        self.max_dimension_spinbox.setRange(0, 65535)
+        self.max_dimension_spinbox.setSingleStep(256)
+        self.max_dimension_spinbox.setSuffix(" px")
+        self.max_dimension_spinbox.setSpecialValueText("Original")  # Shown for 0
+        self.max_dimension_spinbox.setToolTip("Scale converted images down so their longer side is at most this many pixels.<br><br>JPG sources are decoded at reduced size, which keeps memory low for very large photos.<br>Original keeps every image at its full size.")
+        format_layout.addWidget(max_dimension_label)
+        format_layout.addWidget(self.max_dimension_spinbox)
+
+        # Memory budget for the images converted at once
+        memory_budget_label = QLabel("Memory Budget:")
+        self.memory_budget_spinbox = QSpinBox()
+        self.memory_budget_spinbox.setRange(0, 1024)
+        self.memory_budget_spinbox.setSuffix(" GB")
+        self.memory_budget_spinbox.setSpecialValueText("Auto")  # Shown for 0
+        self.memory_budget_spinbox.setToolTip("Limit the memory the images being converted at once may take when decoded.<br><br>Each image's size is read from its header before it is started. Small images run at full parallelism; very large ones wait until enough memory is free, and an image larger than the whole budget runs on its own.<br>Auto uses half of the installed memory.")
+        format_layout.addWidget(memory_budget_label)
+        format_layout.addWidget(self.memory_budget_spinbox)
+
+        # Minimum space a conversion must save to replace the original
+        min_savings_label = QLabel("Min Savings:")
+        self.min_savings_spinbox = QSpinBox()
+        self.min_savings_spinbox.setRange(-1, 90)
+        self.min_savings_spinbox.setSuffix(" %")
+        self.min_savings_spinbox.setSpecialValueText("Off")  # Shown for -1
+        self.min_savings_spinbox.setValue(-1)
+        self.min_savings_spinbox.setToolTip("Keep the original when the converted file is not at least this much smaller, and discard the conversion.<br><br>The decision is recorded in the conversion manifest, so the file is not converted again on later runs while it stays unchanged.<br>0 % keeps originals the conversion would make larger. Off always replaces the original.")
+        format_layout.addWidget(min_savings_label)
+        format_layout.addWidget(self.min_savings_spinbox)
+
+        # Conversion backend selector
+        backend_label = QLabel("Workers:")
+        self.backend_selector = QComboBox()
+        self.backend_selector.addItems(["Auto", "Threads", "Processes"])  # Default Auto
+        self.backend_selector.setToolTip("Select how images are converted in parallel.<br><br>Threads start instantly; processes scale across all cores for HEIC, PNG and TIFF decoding.<br>Auto picks processes for large batches that are mostly such formats.")
+        format_layout.addWidget(backend_label)
+        format_layout.addWidget(self.backend_selector)
+
+        # Metadata removal mode selector
+        metadata_mode_label = QLabel("Metadata Mode:")
+        self.metadata_mode_selector = QComboBox()
+        self.metadata_mode_selector.addItems(["Per File", "Batched", "Built-in"])  # Default Per File
+        self.metadata_mode_selector.setToolTip("Select how ExifTool removes metadata.<br><br>Per File writes a cleaned copy of each image before replacing it.<br>Batched edits hundreds of images per ExifTool command in place, which is much faster on hard drives and network shares. The originals still go to the recycle bin.<br>Built-in rewrites only the JPG headers without ExifTool and is used automatically when ExifTool is not installed.")
+        format_layout.addWidget(metadata_mode_label)
+        format_layout.addWidget(self.metadata_mode_selector)
+
         # Buttons for conversion and metadata removal
         button_layout = QHBoxLayout()
         convert_button = QPushButton("Convert Images")
@@ -65,12 +157,13 @@ class ImageProcessingWidget(QWidget):
         button_layout.addWidget(stop_button)
 
         # Log text box
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setToolTip("Displays the log messages for image processing operations.")
+        self.log_text = BoundedLogView("image_processing")
+        self.log_text.setToolTip("Displays the most recent log messages for image processing operations.<br><br>The full log is kept in the logs folder.")
 
         # Photo count labels
         count_layout = QHBoxLayout()
+        self.total_photos = 0
+        self.remaining_photos = None  # Last remaining count the worker reported this run
         self.total_photos_label = QLabel("Total Photos: 0")
         self.total_photos_label.setToolTip("Displays the total number of photos to be processed.")
         self.remaining_photos_label = QLabel("Remaining Photos: 0")
@@ -86,6 +179,8 @@ class ImageProcessingWidget(QWidget):
 
         layout.addLayout(dir_layout)
         layout.addWidget(self.use_max_cores_checkbox)
+        layout.addWidget(self.use_manifest_checkbox)
+        layout.addWidget(self.watch_checkbox)
         layout.addLayout(format_layout)
         layout.addLayout(button_layout)
         layout.addLayout(count_layout)
@@ -97,8 +192,7 @@ class ImageProcessingWidget(QWidget):
 
     def update_status(self, message):
         # Append message to the log text box and scroll to the end
-        self.log_text.append(message)
-        self.log_text.moveCursor(QTextCursor.End)
+        self.log_text.append_message(message)
 
     def update_status_bar(self, message):
         # Show message in the status bar
@@ -109,8 +203,21 @@ class ImageProcessingWidget(QWidget):
         self.progress_bar.setValue(value)
 
     def update_photo_counts(self, total, remaining):
-        # Update the total and remaining photo counts
+        # Reset the total and remaining photo counts, e.g. when a run starts
+        self.remaining_photos = None
+        self.update_total_photos(total)
+        self.remaining_photos_label.setText(f"Remaining Photos: {remaining}")
+
+    def update_total_photos(self, total):
+        # Update the photos found so far; remaining only follows it until the worker reports progress
+        self.total_photos = total
         self.total_photos_label.setText(f"Total Photos: {total}")
+        if self.remaining_photos is None:
+            self.remaining_photos_label.setText(f"Remaining Photos: {total}")
+
+    def update_remaining_photos(self, remaining):
+        # Update the remaining photo count reported by the worker
+        self.remaining_photos = remaining
         self.remaining_photos_label.setText(f"Remaining Photos: {remaining}")
 
     def on_finished(self):
@@ -122,6 +229,7 @@ class VideoProcessingWidget(QWidget):
         super().__init__()
         self.init_ui()
         self.worker_thread = None
+        self.signal_batcher = SignalBatcher(self)  # Delivers worker signals in timed batches
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -152,6 +260,50 @@ class VideoProcessingWidget(QWidget):
         self.use_handbrake_checkbox = QCheckBox("Use HandBrake CLI (Unchecked = ffmpeg)")
         self.use_handbrake_checkbox.setToolTip("Enable this option to use HandBrake CLI instead of ffmpeg for video processing.<br><br>When unchecked, ffmpeg is used.")
 
+        # Checkbox for ignoring cached probe results
+        self.revalidate_cache_checkbox = QCheckBox("Revalidate Probe Cache")
+        self.revalidate_cache_checkbox.setToolTip("Enable this option to probe every video again with ffprobe instead of reusing results from earlier runs.<br><br>Unchanged files are normally classified from the cache.")
+
+        # Checkbox for finishing all remuxes before any encode starts
+        self.triage_first_checkbox = QCheckBox("Finish Remuxes Before Encoding")
+        self.triage_first_checkbox.setChecked(True)  # Check by default
+        self.triage_first_checkbox.setToolTip("Enable this option to classify every video first and run all copy-only remuxes before starting any encode.<br><br>When unchecked, each video is processed as soon as it has been checked.")
+
+        # Checkbox for processing videos that are added after the first pass
+        self.watch_checkbox = QCheckBox("Keep Watching for New Files")
+        self.watch_checkbox.setToolTip("Keep the worker running after the first pass and process new or changed files once they have stopped changing, until Stop All is pressed.<br><br>Files are picked up after a few seconds without changes, so copies still in progress are not touched.")
+
+        # Minimum space an encode must save to replace the original
+        self.min_savings_spinbox = QSpinBox()
+        self.min_savings_spinbox.setRange(-1, 90)
+        self.min_savings_spinbox.setSuffix(" %")
+        self.min_savings_spinbox.setSpecialValueText("Off")  # Shown for -1
+        self.min_savings_spinbox.setValue(-1)
+        self.min_savings_spinbox.setToolTip("Keep the original when the encoded file is not at least this much smaller, and discard the encode.<br><br>The decision is recorded in the probe cache, so the file is not encoded again on later runs while it stays unchanged.<br>0 % keeps originals the encode would make larger. Off always replaces the original.<br>Remuxes and audio-only fixes always replace the original.")
+
+        # Concurrent job limits per encoder type
+        jobs_layout = QHBoxLayout()
+        self.cpu_jobs_spinbox = QSpinBox()
+        self.cpu_jobs_spinbox.setRange(1, 64)
+        self.cpu_jobs_spinbox.setValue(1)
+        self.cpu_jobs_spinbox.setToolTip("Number of CPU encodes (libx265/libx264/x265/x264) to run at the same time.")
+        self.hardware_jobs_spinbox = QSpinBox()
+        self.hardware_jobs_spinbox.setRange(1, 16)
+        self.hardware_jobs_spinbox.setValue(1)
+        self.hardware_jobs_spinbox.setToolTip("Number of GPU encodes (NVENC/VCE) to run at the same time.<br><br>Consumer GPUs limit how many encode sessions can be open at once.")
+        self.remux_jobs_spinbox = QSpinBox()
+        self.remux_jobs_spinbox.setRange(1, 32)
+        self.remux_jobs_spinbox.setValue(2)
+        self.remux_jobs_spinbox.setToolTip("Number of copy-only remuxes to run at the same time. Remuxes are disk-bound and can overlap with encodes.")
+        jobs_layout.addWidget(QLabel("CPU Encodes:"))
+        jobs_layout.addWidget(self.cpu_jobs_spinbox)
+        jobs_layout.addWidget(QLabel("GPU Encodes:"))
+        jobs_layout.addWidget(self.hardware_jobs_spinbox)
+        jobs_layout.addWidget(QLabel("Remuxes:"))
+        jobs_layout.addWidget(self.remux_jobs_spinbox)
+        jobs_layout.addWidget(QLabel("Min Savings:"))
+        jobs_layout.addWidget(self.min_savings_spinbox)
+
         # Layout for checkboxes
         checkbox_layout = QHBoxLayout()
         checkbox_layout.addWidget(self.use_gpu_checkbox)
@@ -175,6 +327,8 @@ class VideoProcessingWidget(QWidget):
 
         # Video count labels
         count_layout = QHBoxLayout()
+        self.total_videos = 0
+        self.remaining_videos = None  # Last remaining count the worker reported this run
         self.total_videos_label = QLabel("Total Videos: 0")
         self.total_videos_label.setToolTip("Displays the total number of videos to be processed.")
         self.remaining_videos_label = QLabel("Remaining Videos: 0")
@@ -183,12 +337,14 @@ class VideoProcessingWidget(QWidget):
         count_layout.addWidget(self.remaining_videos_label, alignment=Qt.AlignRight)
 
         # Log text boxes
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setToolTip("Displays the log messages for video processing operations.")
-        self.ffmpeg_output_text = QTextEdit()
-        self.ffmpeg_output_text.setReadOnly(True)
-        self.ffmpeg_output_text.setToolTip("Displays the output messages from ffmpeg during video processing.")
+        self.log_text = BoundedLogView("video_processing")
+        self.log_text.setToolTip("Displays the most recent log messages for video processing operations.<br><br>The full log is kept in the logs folder.")
+        self.ffmpeg_output_text = BoundedLogView("ffmpeg_output")
+        self.ffmpeg_output_text.setToolTip("Displays the most recent output messages from ffmpeg during video processing.<br><br>The full log is kept in the logs folder.")
+
+        # Per-file encode progress
+        self.encode_progress_label = QLabel("Current File: -")
+        self.encode_progress_label.setToolTip("Displays the progress, speed and estimated time left of the file being encoded, and the estimated time left for all queued videos.")
 
         # Status bar and progress bar
         self.status_bar = QStatusBar()
@@ -198,10 +354,17 @@ class VideoProcessingWidget(QWidget):
 
         layout.addLayout(dir_layout)
         layout.addLayout(checkbox_layout)
+        cache_layout = QHBoxLayout()
+        cache_layout.addWidget(self.revalidate_cache_checkbox)
+        cache_layout.addWidget(self.watch_checkbox, alignment=Qt.AlignCenter)
+        cache_layout.addWidget(self.triage_first_checkbox, alignment=Qt.AlignRight)
+        layout.addLayout(cache_layout)
+        layout.addLayout(jobs_layout)
         layout.addLayout(button_layout)
         layout.addLayout(count_layout)
         layout.addWidget(self.log_text)
         layout.addWidget(self.ffmpeg_output_text)
+        layout.addWidget(self.encode_progress_label)
         layout.addWidget(self.status_bar)
         layout.addWidget(self.progress_bar)
 
@@ -215,8 +378,7 @@ class VideoProcessingWidget(QWidget):
 
     def update_status(self, message):
         # Append message to the log text box and scroll to the end
-        self.log_text.append(message)
-        self.log_text.moveCursor(QTextCursor.End)
+        self.log_text.append_message(message)
 
     def update_status_bar(self, message):
         # Show message in the status bar
@@ -224,16 +386,39 @@ class VideoProcessingWidget(QWidget):
 
     def update_ffmpeg_output(self, message):
         # Append ffmpeg output message to the ffmpeg log text box and scroll to the end
-        self.ffmpeg_output_text.append(message)
-        self.ffmpeg_output_text.moveCursor(QTextCursor.End)
+        self.ffmpeg_output_text.append_message(message)
 
     def update_progress(self, value):
         # Update the progress bar value
         self.progress_bar.setValue(value)
 
+    def update_encode_progress(self, progress):
+        # Show the structured progress of the most recently updated job
+        name = os.path.basename(progress.file_path)
+        percent = f"{progress.percent:.1f}%" if progress.percent is not None else "--%"
+        fps = f"{progress.fps:.1f} fps" if progress.fps is not None else "-- fps"
+        speed = f"{progress.speed:.2f}x" if progress.speed is not None else "--x"
+        self.encode_progress_label.setText(
+            f"Current File: {name} | {percent} | {fps} | {speed} | ETA {format_seconds(progress.eta_seconds)} | "
+            f"Batch ETA {format_seconds(progress.batch_eta_seconds)}"
+        )
+
     def update_video_counts(self, total, remaining):
-        # Update the total and remaining video counts
+        # Reset the total and remaining video counts, e.g. when a run starts
+        self.remaining_videos = None
+        self.update_total_videos(total)
+        self.remaining_videos_label.setText(f"Remaining Videos: {remaining}")
+
+    def update_total_videos(self, total):
+        # Update the videos found so far; remaining only follows it until the worker reports progress
+        self.total_videos = total
         self.total_videos_label.setText(f"Total Videos: {total}")
+        if self.remaining_videos is None:
+            self.remaining_videos_label.setText(f"Remaining Videos: {total}")
+
+    def update_remaining_videos(self, remaining):
+        # Update the remaining video count reported by the worker
+        self.remaining_videos = remaining
         self.remaining_videos_label.setText(f"Remaining Videos: {remaining}")
 
     def on_finished(self):